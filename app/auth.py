@@ -1,13 +1,44 @@
+import asyncio
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, Request
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
+from starlette.requests import HTTPConnection
+from app.services.metrics import inc, stage
 
 SECRET_KEY = os.getenv("SECRET_KEY", "devsecret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60*24
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost. Hashes made with any other cost are re-hashed on the user's next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Hashing runs on its own small pool so a login burst can't starve the shared request threadpool
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+AUTH_HASH_MAX_PENDING = int(os.getenv("AUTH_HASH_MAX_PENDING", "32"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_hash_executor = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix="bcrypt")
+_pending = threading.BoundedSemaphore(AUTH_HASH_MAX_PENDING)
+
+
+class HashingBusy(Exception):
+    """
+    More password hashes are queued than AUTH_HASH_MAX_PENDING; the caller should answer 503.
+    """
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -15,14 +46,176 @@ def hash_password(password: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
+def verify_and_update(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    (valid, new_hash): new_hash is set when the stored hash uses outdated cost parameters.
+    """
+    return pwd_context.verify_and_update(plain, hashed)
+
+async def _run_hashing(fn, *args):
+    if not _pending.acquire(blocking=False):
+        raise HashingBusy("Too many password operations in progress")
+    try:
+        with stage("password_hash"):
+            return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _pending.release()
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(hash_password, password)
+
+async def verify_and_update_async(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return await _run_hashing(verify_and_update, plain, hashed)
+
+def _parse_keys(raw: str) -> Dict[str, str]:
+    """
+    SECRET_KEYS="kid:secret,kid:secret": the first key signs new tokens, all of them verify.
+    """
+    keys = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        kid, _, secret = item.partition(":")
+        if secret:
+            keys[kid] = secret
+    return keys
+
+
+# Signing/verification keys by kid. Rotate by putting the new key first and keeping the old
+# one until the tokens it signed have expired.
+_keys: Dict[str, str] = _parse_keys(os.getenv("SECRET_KEYS", "")) or {"default": SECRET_KEY}
+_signing_kid = next(iter(_keys))
+
+
+def set_keys(keys: Dict[str, str], signing_kid: Optional[str] = None):
+    """
+    Replaces the key set at runtime. Cached claims stay valid only if their kid still maps
+    to the same secret, so retiring (or replacing) a key takes effect immediately.
+    """
+    global _keys, _signing_kid
+    _keys = dict(keys)
+    _signing_kid = signing_kid or next(iter(_keys))
+
+
 def create_access_token(data: dict, expires_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, _keys[_signing_kid], algorithm=ALGORITHM, headers={"kid": _signing_kid})
 
-def decode_token(token: str):
+def _verify(token: str) -> Optional[Tuple[dict, str]]:
+    """
+    (claims, kid) for a valid token. Tokens without a kid (issued before rotation support)
+    are tried against every key.
+    """
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        kid = jwt.get_unverified_header(token).get("kid")
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+    candidates = [kid] if kid else list(_keys)
+    for candidate in candidates:
+        secret = _keys.get(candidate)
+        if secret is None:
+            continue
+        try:
+            return jwt.decode(token, secret, algorithms=[ALGORITHM]), candidate
+        except JWTError:
+            continue
+    return None
+
+
+class _ClaimsCache:
+    """
+    TTL/LRU cache of verified claims keyed by token. An entry lives until the token expires
+    or AUTH_CLAIMS_CACHE_SECONDS pass, whichever comes first, and remembers which secret
+    verified it so key rotation can't serve claims for a key that is no longer trusted.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            item = self._items.get(token)
+            if item is None:
+                return None
+            claims, kid, secret, expires_at = item
+            if time.time() >= expires_at or _keys.get(kid) != secret:
+                del self._items[token]
+                return None
+            self._items.move_to_end(token)
+            return claims
+
+    def put(self, token: str, claims: dict, kid: str):
+        expires_at = min(time.time() + self.ttl, float(claims.get("exp", 0)) or time.time() + self.ttl)
+        with self._lock:
+            self._items[token] = (claims, kid, _keys.get(kid), expires_at)
+            self._items.move_to_end(token)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+AUTH_CLAIMS_CACHE_SIZE = int(os.getenv("AUTH_CLAIMS_CACHE_SIZE", "10000"))
+AUTH_CLAIMS_CACHE_SECONDS = float(os.getenv("AUTH_CLAIMS_CACHE_SECONDS", "300"))
+_claims_cache = _ClaimsCache(AUTH_CLAIMS_CACHE_SIZE, AUTH_CLAIMS_CACHE_SECONDS)
+
+
+def decode_token(token: str):
+    """
+    Verified claims for a token, or None. Repeat tokens are served from the claims cache.
+    """
+    claims = _claims_cache.get(token)
+    if claims is not None:
+        inc("auth_token_cache_total", "Access token verifications by cache outcome", outcome="hit")
+        return claims
+    inc("auth_token_cache_total", "Access token verifications by cache outcome", outcome="miss")
+    verified = _verify(token)
+    if verified is None:
+        return None
+    claims, kid = verified
+    _claims_cache.put(token, claims, kid)
+    return claims
+
+
+def token_from_cookie(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    value = value.strip('"')
+    return value[7:] if value.startswith("Bearer ") else value
+
+
+class AuthMiddleware:
+    """
+    Pure ASGI middleware: verifies the `access_token` cookie once per request and exposes
+    the identity as request.state.user_id / request.state.user_email (None when anonymous).
+    Routes authorize from these without querying the users table.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            state = scope.setdefault("state", {})
+            state["user_id"] = state["user_email"] = None
+            token = token_from_cookie(HTTPConnection(scope).cookies.get("access_token"))
+            claims = decode_token(token) if token else None
+            if claims:
+                state["user_id"] = claims.get("user_id")
+                state["user_email"] = claims.get("sub")
+        await self.app(scope, receive, send)
+
+
+def current_user_id(request: Request) -> Optional[int]:
+    return getattr(request.state, "user_id", None)
+
+
+def require_user(request: Request) -> int:
+    """
+    Dependency for routes that need a signed-in user.
+    """
+    user_id = current_user_id(request)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user_id
@@ -1,18 +1,42 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.templating import Jinja2Templates
-from app.routes import auth_routes, upload_routes, suitability, interview
+from app.routes import auth_routes, upload_routes, suitability, interview, jobs, batch, dashboard, analytics
+from app.auth import AuthMiddleware
+from app.db import engine
+from app.migrations import upgrade
+from app.services import pdf_engine
+from app.services.blob_store import UploadSizeLimitMiddleware, request_limit
+from app.services.jobs import start_workers, stop_workers
+from app.services.llm_client import cache_stats
+from app.services.metrics import TimedJinja2Templates, TimingMiddleware, instrument_sessions, render_prometheus
 from starlette.middleware.sessions import SessionMiddleware
-from fastapi.routing import APIRoute
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 
-App = FastAPI(title="AI Powered Interview simulator")
+# Schema upgrades at boot; scaled-out pods set MIGRATE_ON_STARTUP=0 and run
+# `python -m app.migrations` once per deploy instead.
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "1") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MIGRATE_ON_STARTUP:
+        upgrade(engine)
+    start_workers()
+    try:
+        yield
+    finally:
+        stop_workers()
+        pdf_engine.shutdown()
+
+
+App = FastAPI(title="AI Powered Interview simulator", lifespan=lifespan)
 
 # Mounting the templates and static files:
 App.mount("/static", StaticFiles(directory="app/static"), name="static")
-templates = Jinja2Templates(directory="app/templates")
+templates = TimedJinja2Templates(directory="app/templates")
 
 # Setting CORS:
 App.add_middleware(
@@ -23,11 +47,28 @@ App.add_middleware(
     max_age=None
 )
 
+# Verifies the access_token cookie and sets request.state.user_id:
+App.add_middleware(AuthMiddleware)
+
+# Rejects oversized uploads by Content-Length before their bodies are spooled:
+App.add_middleware(UploadSizeLimitMiddleware, limits={
+    "/files/upload": request_limit(2),
+    "/batch/screen": request_limit(batch.BATCH_MAX_RESUMES + 1),
+})
+
+# Per-route / per-stage timings, exported at /metrics:
+App.add_middleware(TimingMiddleware)
+instrument_sessions()
+
 # Include the interview route:
 App.include_router(interview.router, prefix="/interview")
 App.include_router(auth_routes.router, prefix="/auth")
 App.include_router(upload_routes.router, prefix="/files")
 App.include_router(suitability.router, prefix="/suitability")
+App.include_router(jobs.router, prefix="/jobs")
+App.include_router(batch.router, prefix="/batch")
+App.include_router(dashboard.router, prefix="/dashboard")
+App.include_router(analytics.router, prefix="/analytics")
 
 @App.get("/", include_in_schema=False)
 def home(request: Request):
@@ -42,10 +83,13 @@ def test_set(request: Request):
 def test_get(request: Request):
     return {"foo": request.session.get("foo")}
 
-for route in App.routes:
-    if isinstance(route, APIRoute):
-        print(f"Path: {route.path}, Methods: {route.methods}")
-
-
 @App.get("/ping")
 async def ping(): return {"ping": "pong"}
+
+@App.get("/llm/cache-stats")
+def llm_cache_stats(): return cache_stats()
+
+@App.get("/metrics", include_in_schema=False)
+def metrics():
+    gauges = {f"interview_llm_cache_{k}": v for k, v in cache_stats().items()}
+    return PlainTextResponse(render_prometheus(gauges), media_type="text/plain; version=0.0.4")
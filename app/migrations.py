@@ -0,0 +1,272 @@
+# app/migrations.py
+"""
+Versioned schema migrations.
+
+Applied versions are recorded in the `schema_version` table and each
+migration runs once, in order. Steps are written to be idempotent so that a
+fresh database (whose baseline already matches the models) and an old one
+both converge on the same schema. Run before serving traffic:
+
+    python -m app.migrations
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from app.services.blob_store import get_blob_store
+
+
+def _columns(engine, table: str) -> set:
+    return {c["name"] for c in inspect(engine).get_columns(table)}
+
+
+def _baseline(engine):
+    from app.db import Base
+    Base.metadata.create_all(bind=engine)
+
+
+def _add_upload_hash_columns(engine):
+    cols = _columns(engine, "uploads")
+    with engine.begin() as conn:
+        for name in ("resume_sha256", "jd_sha256"):
+            if name not in cols:
+                conn.execute(text(f"ALTER TABLE uploads ADD COLUMN {name} VARCHAR(64)"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_uploads_{name} ON uploads ({name})"))
+
+
+def _move_upload_blobs(engine):
+    """
+    Moves uploads.resume_blob / jd_blob into the blob store, then drops the columns.
+    Rows are copied one at a time so the whole table is never in memory.
+    """
+    cols = _columns(engine, "uploads")
+    if "resume_blob" not in cols and "jd_blob" not in cols:
+        return
+
+    store = get_blob_store()
+    with engine.connect() as conn:
+        ids = [row[0] for row in conn.execute(text(
+            "SELECT id FROM uploads WHERE resume_blob IS NOT NULL OR jd_blob IS NOT NULL"
+        ))]
+
+    for upload_id in ids:
+        with engine.begin() as conn:
+            row = conn.execute(
+                text("SELECT resume_blob, jd_blob FROM uploads WHERE id = :id"), {"id": upload_id}
+            ).one()
+            for kind, blob in (("resume", row[0]), ("jd", row[1])):
+                if blob is None:
+                    continue
+                data = blob.encode("latin-1") if isinstance(blob, str) else bytes(blob)
+                sha256, path = store.put_bytes(data)
+                conn.execute(
+                    text(f"UPDATE uploads SET {kind}_sha256 = :sha, {kind}_path = :path WHERE id = :id"),
+                    {"sha": sha256, "path": path, "id": upload_id},
+                )
+
+    with engine.begin() as conn:
+        for name in ("resume_blob", "jd_blob"):
+            if name in cols:
+                conn.execute(text(f"ALTER TABLE uploads DROP COLUMN {name}"))
+
+    if engine.dialect.name == "sqlite":
+        # Give the freed pages back to the filesystem
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+
+
+def _add_upload_indexes(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_uploads_created_at ON uploads (created_at)"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_uploads_user_id_created_at ON uploads (user_id, created_at)"
+        ))
+
+
+def _add_extraction_metadata(engine):
+    cols = _columns(engine, "extracted_texts")
+    with engine.begin() as conn:
+        for name, ddl in (
+            ("format", "VARCHAR"),
+            ("page_offsets", "TEXT"),
+            ("sections", "TEXT"),
+            ("extractor_version", "INTEGER NOT NULL DEFAULT 1"),
+        ):
+            if name not in cols:
+                conn.execute(text(f"ALTER TABLE extracted_texts ADD COLUMN {name} {ddl}"))
+
+
+def _add_batches(engine):
+    from app.db import Batch
+    Batch.__table__.create(bind=engine, checkfirst=True)
+    cols = _columns(engine, "uploads")
+    with engine.begin() as conn:
+        if "batch_id" not in cols:
+            conn.execute(text("ALTER TABLE uploads ADD COLUMN batch_id INTEGER REFERENCES batches (id)"))
+        if "resume_filename" not in cols:
+            conn.execute(text("ALTER TABLE uploads ADD COLUMN resume_filename VARCHAR"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_uploads_batch_id ON uploads (batch_id)"))
+
+
+def _add_question_bank(engine):
+    from app.db import BankQuestion
+    from app.services.question_bank import seed_rows, text_hash
+    BankQuestion.__table__.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        for question, tags in seed_rows():
+            exists = conn.execute(
+                text("SELECT 1 FROM question_bank WHERE text_hash = :h"), {"h": text_hash(question)}
+            ).first()
+            if not exists:
+                conn.execute(
+                    text("INSERT INTO question_bank (text, text_hash, jd_key, tags, source, created_at) "
+                         "VALUES (:text, :h, NULL, :tags, 'seed', :t)"),
+                    {"text": question, "h": text_hash(question), "tags": tags, "t": datetime.utcnow()},
+                )
+
+
+def _add_dashboard_indexes(engine):
+    cols = _columns(engine, "uploads")
+    with engine.begin() as conn:
+        if "analyzed_at" not in cols:
+            conn.execute(text("ALTER TABLE uploads ADD COLUMN analyzed_at DATETIME"))
+            conn.execute(text("UPDATE uploads SET analyzed_at = created_at WHERE strengths IS NOT NULL"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_uploads_user_id_created_at_id ON uploads (user_id, created_at, id)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_uploads_user_id_analysis_score_id ON uploads (user_id, analysis_score, id)"
+        ))
+        # Superseded by the (user_id, created_at, id) index
+        conn.execute(text("DROP INDEX IF EXISTS ix_uploads_user_id_created_at"))
+
+
+def _add_answer_evaluations(engine):
+    from app.db import AnswerEvaluation
+    AnswerEvaluation.__table__.create(bind=engine, checkfirst=True)
+
+
+def _json_list(value) -> list:
+    try:
+        data = json.loads(value) if value else []
+    except ValueError:
+        return []
+    return data if isinstance(data, list) else []
+
+
+def _normalize_results(engine):
+    from app.db import EvaluationItem, InterviewEvaluation, InterviewQuestion
+    from app.services.results import SUITABILITY_ITEMS, normalize_item
+    for model in (InterviewQuestion, EvaluationItem, InterviewEvaluation):
+        model.__table__.create(bind=engine, checkfirst=True)
+
+    json_columns = [c for c in ("questions", *SUITABILITY_ITEMS) if c in _columns(engine, "uploads")]
+    if json_columns:
+        # Copy and drop in one transaction, so a failure leaves the JSON columns in place
+        with engine.begin() as conn:
+            rows = conn.execute(text(f"SELECT id, {', '.join(json_columns)} FROM uploads")).mappings().all()
+            for row in rows:
+                for position, question in enumerate(_json_list(row.get("questions"))):
+                    conn.execute(
+                        text("INSERT INTO interview_questions (upload_id, position, text) VALUES (:u, :p, :t)"),
+                        {"u": row["id"], "p": position, "t": str(question)},
+                    )
+                for field, kind in SUITABILITY_ITEMS.items():
+                    for position, item in enumerate(_json_list(row.get(field))):
+                        conn.execute(
+                            text("INSERT INTO evaluation_items (upload_id, kind, position, text, normalized) "
+                                 "VALUES (:u, :k, :p, :t, :n)"),
+                            {"u": row["id"], "k": kind, "p": position, "t": str(item), "n": normalize_item(str(item))},
+                        )
+            for name in json_columns:
+                conn.execute(text(f"ALTER TABLE uploads DROP COLUMN {name}"))
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_uploads_user_id_jd_sha256_analysis_score "
+            "ON uploads (user_id, jd_sha256, analysis_score)"
+        ))
+
+
+def _add_jd_rollups(engine):
+    from app.db import JdRollup, JdRollupItem
+    from app.services.analytics import rebuild_rollups
+    for model in (JdRollup, JdRollupItem):
+        model.__table__.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_answer_evaluations_upload_id_score_question "
+            "ON answer_evaluations (upload_id, score, question)"
+        ))
+        rebuild_rollups(conn)
+
+
+def _drop_fallback_results(engine):
+    """
+    Heuristic interview grades were stored before fallbacks were flagged. They are
+    recognizable by their feedback text; clear them so they are graded again, and rebuild
+    the rollups they were folded into.
+    """
+    from app.services.analytics import rebuild_rollups
+    from app.services.results import INTERVIEW_ITEMS
+    kinds = ", ".join(f"'{kind}'" for kind in INTERVIEW_ITEMS.values())
+    fallback = "(feedback LIKE 'Basic evaluation:%' OR feedback LIKE 'Evaluation failed:%')"
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"DELETE FROM evaluation_items WHERE kind IN ({kinds}) AND upload_id IN "
+            f"(SELECT upload_id FROM interview_evaluations WHERE {fallback})"
+        ))
+        conn.execute(text(f"DELETE FROM interview_evaluations WHERE {fallback}"))
+        conn.execute(text(
+            "UPDATE answer_evaluations SET score = NULL, feedback = NULL, evaluated_at = NULL "
+            "WHERE feedback LIKE 'Basic evaluation:%'"
+        ))
+        rebuild_rollups(conn)
+
+
+# (version, description, step) -- append only, never renumber
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "content hash columns on uploads", _add_upload_hash_columns),
+    (3, "move upload blobs into the blob store", _move_upload_blobs),
+    (4, "uploads user/created_at indexes", _add_upload_indexes),
+    (5, "extraction metadata on extracted_texts", _add_extraction_metadata),
+    (6, "batch screening", _add_batches),
+    (7, "question bank with seed questions", _add_question_bank),
+    (8, "dashboard summary column and keyset indexes", _add_dashboard_indexes),
+    (9, "per-answer interview evaluations", _add_answer_evaluations),
+    (10, "normalized questions and evaluation items", _normalize_results),
+    (11, "per-JD analytics rollups and answer covering index", _add_jd_rollups),
+    (12, "drop stored fallback interview grades", _drop_fallback_results),
+]
+
+
+def current_version(engine) -> int:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, description VARCHAR NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+        return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+
+def upgrade(engine, verbose: bool = False):
+    version = current_version(engine)
+    for number, description, step in MIGRATIONS:
+        if number <= version:
+            continue
+        if verbose:
+            print(f"Applying migration {number}: {description}")
+        step(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": number, "d": description, "t": datetime.utcnow()},
+            )
+
+
+if __name__ == "__main__":
+    from app.db import engine
+    upgrade(engine, verbose=True)
+    print(f"Database at schema version {current_version(engine)}.")
@@ -0,0 +1,49 @@
+# app/routes/analytics.py
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.auth import require_user
+from app.db import SessionLocal
+from app.services.analytics import ANALYTICS_TOP_ITEMS, jd_report, list_rollups
+from app.services.metrics import stage
+
+router = APIRouter()
+
+
+def _list_rollups(user_id: int) -> list:
+    db = SessionLocal()
+    try:
+        return list_rollups(db, user_id)
+    finally:
+        db.close()
+
+
+def _jd_report(user_id: int, jd_sha256: str, top: int):
+    db = SessionLocal()
+    try:
+        with stage("analytics_report"):
+            return jd_report(db, user_id, jd_sha256, top)
+    finally:
+        db.close()
+
+
+@router.get("/jds")
+async def analytics_jds(user_id: int = Depends(require_user)):
+    """
+    Candidate counts and score mean/std for every JD the signed-in user has screened against.
+    """
+    return await run_in_threadpool(_list_rollups, user_id)
+
+
+@router.get("/jd/{jd_sha256}")
+async def analytics_jd(jd_sha256: str, user_id: int = Depends(require_user),
+                       top: int = Query(ANALYTICS_TOP_ITEMS, ge=1, le=100)):
+    """
+    Score distributions, the most common strengths and weaknesses, and the questions that best
+    separate strong from weak candidates for one JD. The NumPy work runs off the event loop.
+    """
+    report = await run_in_threadpool(_jd_report, user_id, jd_sha256, top)
+    if report is None:
+        return JSONResponse({"error": "No candidates for this JD"}, status_code=404)
+    return report
@@ -1,35 +1,73 @@
 # app/routes/auth_routes.py
+import os
 from fastapi import APIRouter, Form, Depends, Request, Response, status
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from app.db import SessionLocal, User
-from app.auth import hash_password, verify_password, create_access_token
-from app.db import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_async_db, User
+from app.services.metrics import TimedJinja2Templates
+from app.services.rate_limit import TokenBucketLimiter
+from app.auth import HashingBusy, hash_password_async, verify_and_update_async, create_access_token
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+templates = TimedJinja2Templates(directory="app/templates")
+
+# Checked before any bcrypt work, so a credential-stuffing burst is refused cheaply
+ip_limiter = TokenBucketLimiter(
+    "auth_ip",
+    float(os.getenv("AUTH_IP_RATE_PER_MINUTE", "20")),
+    int(os.getenv("AUTH_IP_BURST", "10")),
+)
+email_limiter = TokenBucketLimiter(
+    "auth_email",
+    float(os.getenv("AUTH_EMAIL_RATE_PER_MINUTE", "5")),
+    int(os.getenv("AUTH_EMAIL_BURST", "5")),
+)
+
+
+def _rate_limited(request: Request, email: str, template: str):
+    """
+    Returns a 429 page if this client or this account is over its attempt budget, else None.
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    for limiter, key in ((ip_limiter, client_ip), (email_limiter, email.strip().lower())):
+        if not limiter.allow(key):
+            return templates.TemplateResponse(
+                template,
+                {"request": request, "error": "Too many attempts. Please wait a minute and try again."},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(limiter.retry_after())},
+            )
+    return None
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+def _busy(request: Request, template: str):
+    return templates.TemplateResponse(
+        template,
+        {"request": request, "error": "The server is busy. Please try again in a moment."},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "1"},
+    )
 
 @router.get("/register", response_class=HTMLResponse, name="register_form")
 def register_form(request: Request):
     return templates.TemplateResponse("register.html", {"request": request})
 
 @router.post("/register", response_class=HTMLResponse)
-def register_action(request: Request, email: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == email).first()
+async def register_action(request: Request, email: str = Form(...), password: str = Form(...), db: AsyncSession = Depends(get_async_db)):
+    limited = _rate_limited(request, email, "register.html")
+    if limited:
+        return limited
+    existing = (await db.execute(select(User.id).where(User.email == email))).first()
     if existing:
         return templates.TemplateResponse("register.html", {"request": request, "error": "User already exists"})
-    user = User(email=email, hashed_password=hash_password(password))
+    try:
+        hashed = await hash_password_async(password)
+    except HashingBusy:
+        return _busy(request, "register.html")
+    user = User(email=email, hashed_password=hashed)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
     # After registration, redirect to login page (GET)
     return templates.TemplateResponse("login.html", {"request": request, "success": "Registration successful. Please log in."})
 
@@ -38,10 +76,23 @@ def login_form(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
 
 @router.post("/login")
-def login_action(request: Request, response: Response, email: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+async def login_action(request: Request, response: Response, email: str = Form(...), password: str = Form(...), db: AsyncSession = Depends(get_async_db)):
+    limited = _rate_limited(request, email, "login.html")
+    if limited:
+        return limited
+    user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+    if not user:
+        return templates.TemplateResponse("login.html", {"request": request, "error": "Invalid credentials"})
+    try:
+        valid, new_hash = await verify_and_update_async(password, user.hashed_password)
+    except HashingBusy:
+        return _busy(request, "login.html")
+    if not valid:
         return templates.TemplateResponse("login.html", {"request": request, "error": "Invalid credentials"})
+    if new_hash:
+        # Cost parameters changed since this hash was made; upgrade it transparently
+        user.hashed_password = new_hash
+        await db.commit()
     token = create_access_token({"user_id": user.id, "sub": user.email})
     redirect = RedirectResponse(url="/files/upload_form", status_code=status.HTTP_303_SEE_OTHER)
     # set cookie on the RedirectResponse that we will return
@@ -0,0 +1,219 @@
+# app/routes/batch.py
+"""
+Batch screening: one JD against many resumes in a single request.
+
+Resumes come in as repeated `resumes` files and/or a `archive` zip. All
+texts are extracted in parallel, ranked locally against the JD (BM25, no
+model call), and then scored with analyze_candidate in rank order with
+bounded concurrency. Per-candidate results stream back as server-sent
+events and are stored on Upload rows linked to a Batch.
+"""
+import asyncio
+import json
+import os
+import zipfile
+from typing import List, Optional
+
+from fastapi import APIRouter, UploadFile, File, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.auth import require_user
+from app.db import SessionLocal, get_async_db, Batch, Upload
+from app.services.blob_store import MAX_UPLOAD_BYTES, UploadTooLarge, get_blob_store, save_upload
+from app.services.context_selector import rank_documents
+from app.services.extractors import sniff_format
+from app.services.jobs import enqueue
+from app.services.results import load_suitabilities, save_suitability
+from app.services.suitability_agent import analyze_candidate
+from app.services.text_extraction import get_stored_text
+
+BATCH_MAX_RESUMES = int(os.getenv("BATCH_MAX_RESUMES", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+router = APIRouter()
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _unpack_archive(fileobj, limit: int) -> List[tuple]:
+    """
+    Stores every supported document in a zip. Returns [(filename, sha256, path)].
+    Members are size-checked from the directory before being read.
+    """
+    store = get_blob_store()
+    out = []
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or os.path.basename(info.filename).startswith("."):
+                continue
+            if len(out) >= limit:
+                raise UploadTooLarge(f"archive holds more than {limit} resumes")
+            if info.file_size > MAX_UPLOAD_BYTES:
+                raise UploadTooLarge(f"{info.filename} exceeds {MAX_UPLOAD_BYTES} bytes")
+            data = archive.read(info)
+            if sniff_format(data) == "unknown":
+                continue
+            sha256, path = store.put_bytes(data)
+            out.append((os.path.basename(info.filename), sha256, path))
+    return out
+
+
+def _create_uploads(user_id: int, jd_sha256: str, jd_path: str, resumes: List[tuple]):
+    db = SessionLocal()
+    try:
+        batch = Batch(user_id=user_id, jd_path=jd_path, jd_sha256=jd_sha256, resume_count=len(resumes))
+        db.add(batch)
+        db.flush()
+        uploads = [
+            Upload(
+                user_id=user_id,
+                batch_id=batch.id,
+                resume_filename=filename,
+                resume_path=path,
+                resume_sha256=sha256,
+                jd_path=jd_path,
+                jd_sha256=jd_sha256,
+            )
+            for filename, sha256, path in resumes
+        ]
+        db.add_all(uploads)
+        db.commit()
+        return batch.id, [u.id for u in uploads]
+    finally:
+        db.close()
+
+
+def _save_result(upload_id: int, result: dict):
+    db = SessionLocal()
+    try:
+        upload = db.get(Upload, upload_id)
+        if upload:
+            save_suitability(db, upload, result)
+    finally:
+        db.close()
+
+
+def _enqueue_remaining(upload_ids: List[int]):
+    db = SessionLocal()
+    try:
+        for upload_id in upload_ids:
+            enqueue(db, "suitability", upload_id)
+    finally:
+        db.close()
+
+
+@router.post("/screen")
+async def screen_batch(
+    user_id: int = Depends(require_user),
+    jd: UploadFile = File(...),
+    resumes: List[UploadFile] = File(default=[]),
+    archive: Optional[UploadFile] = File(None),
+):
+    """
+    Server-sent events: `ranked` (local pre-rank of every resume), one `candidate` event
+    per analysis as it completes, then `done`. Analyses still outstanding when the client
+    disconnects, or that failed or fell back to the keyword estimate, are handed to the job queue.
+    """
+    try:
+        jd_sha256, jd_path = await save_upload(jd)
+        stored = []
+        for resume in resumes:
+            if len(stored) >= BATCH_MAX_RESUMES:
+                raise UploadTooLarge(f"more than {BATCH_MAX_RESUMES} resumes")
+            sha256, path = await save_upload(resume)
+            stored.append((resume.filename, sha256, path))
+        if archive is not None:
+            stored += await run_in_threadpool(_unpack_archive, archive.file, BATCH_MAX_RESUMES - len(stored))
+    except UploadTooLarge as e:
+        return JSONResponse({"error": f"Batch too large: {e}"}, status_code=413)
+    except zipfile.BadZipFile:
+        return JSONResponse({"error": "archive is not a valid zip file"}, status_code=400)
+    if not stored:
+        return JSONResponse({"error": "No resumes provided"}, status_code=400)
+
+    # Extract the JD and every resume in parallel (PDFs fan out to the process pool)
+    jd_text, *resume_texts = await asyncio.gather(
+        run_in_threadpool(get_stored_text, jd_sha256, jd_path),
+        *(run_in_threadpool(get_stored_text, sha256, path) for _, sha256, path in stored),
+    )
+    batch_id, upload_ids = await run_in_threadpool(_create_uploads, user_id, jd_sha256, jd_path, stored)
+
+    scores = rank_documents(resume_texts, jd_text)
+    order = sorted(range(len(stored)), key=lambda i: -scores[i])
+    ranked = [
+        {"upload_id": upload_ids[i], "filename": stored[i][0], "rank_score": round(float(scores[i]), 3)}
+        for i in order
+    ]
+
+    async def events():
+        yield _sse("ranked", {"batch_id": batch_id, "candidates": ranked})
+
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        pending = set(upload_ids)
+        failed = []
+
+        async def analyze(i: int):
+            async with semaphore:
+                try:
+                    result = await analyze_candidate(resume_texts[i], jd_text)
+                except Exception as e:
+                    return i, None, str(e)
+                if result.get("fallback"):
+                    # Shown, but not stored: the job queue retries it with the model
+                    return i, result, "model unavailable, keyword estimate only"
+                await run_in_threadpool(_save_result, upload_ids[i], result)
+                return i, result, None
+
+        # Semaphore waiters are FIFO, so the best pre-ranked candidates are analyzed first
+        tasks = [asyncio.ensure_future(analyze(i)) for i in order]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                i, result, error = await next_done
+                pending.discard(upload_ids[i])
+                if error is not None:
+                    failed.append(upload_ids[i])
+                yield _sse("candidate", {
+                    "upload_id": upload_ids[i],
+                    "filename": stored[i][0],
+                    "rank_score": round(float(scores[i]), 3),
+                    "result": result,
+                    "error": error,
+                })
+            yield _sse("done", {"batch_id": batch_id, "count": len(upload_ids), "failed": len(failed)})
+        finally:
+            for task in tasks:
+                task.cancel()
+            if pending or failed:
+                # Quick local writes; kept synchronous so they also run while the stream is being torn down
+                _enqueue_remaining(sorted(pending) + failed)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/{batch_id}")
+async def get_batch(batch_id: int, user_id: int = Depends(require_user), db: AsyncSession = Depends(get_async_db)):
+    """
+    Stored results for one of the user's batches, best suitability score first (unscored
+    candidates last). Other users' batches are reported as not found.
+    """
+    batch = await db.get(Batch, batch_id)
+    if not batch or batch.user_id != user_id:
+        return JSONResponse({"error": "Batch not found"}, status_code=404)
+    uploads = (await db.execute(select(Upload).where(Upload.batch_id == batch_id))).scalars().all()
+    results = await db.run_sync(load_suitabilities, uploads)
+    candidates = [
+        {"upload_id": u.id, "filename": u.resume_filename, "result": results[u.id]}
+        for u in uploads
+    ]
+    candidates.sort(key=lambda c: (c["result"] is None, -((c["result"] or {}).get("score") or 0)))
+    return {
+        "batch_id": batch.id,
+        "resume_count": batch.resume_count,
+        "completed": sum(1 for c in candidates if c["result"] is not None),
+        "candidates": candidates,
+    }
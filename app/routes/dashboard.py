@@ -0,0 +1,94 @@
+# app/routes/dashboard.py
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import JSONResponse, RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.auth import current_user_id, require_user
+from app.db import get_async_db
+from app.services.dashboard import (
+    DASHBOARD_PAGE_SIZE, SORTS, InvalidCursor, average_score_by_jd, common_items, list_uploads,
+)
+from app.services.results import INTERVIEW_ITEMS, SUITABILITY_ITEMS
+from app.services.metrics import TimedJinja2Templates
+
+router = APIRouter()
+templates = TimedJinja2Templates(directory="app/templates")
+
+
+async def _page(db: AsyncSession, user_id: int, sort: str, cursor: Optional[str], limit: int,
+                min_score: Optional[int], max_score: Optional[int], analyzed: Optional[bool]):
+    return await db.run_sync(
+        lambda session: list_uploads(session, user_id, sort, cursor, limit, min_score, max_score, analyzed)
+    )
+
+
+@router.get("/uploads")
+async def dashboard_uploads(
+    user_id: int = Depends(require_user),
+    sort: str = Query("recent"),
+    cursor: Optional[str] = None,
+    limit: int = Query(DASHBOARD_PAGE_SIZE, ge=1),
+    min_score: Optional[int] = None,
+    max_score: Optional[int] = None,
+    analyzed: Optional[bool] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    One page of the signed-in user's uploads; pass `next_cursor` back as `cursor` for the next page.
+    """
+    if sort not in SORTS:
+        return JSONResponse({"error": f"sort must be one of {', '.join(SORTS)}"}, status_code=400)
+    try:
+        return await _page(db, user_id, sort, cursor, limit, min_score, max_score, analyzed)
+    except InvalidCursor:
+        return JSONResponse({"error": "Invalid cursor"}, status_code=400)
+
+
+@router.get("/insights")
+async def dashboard_insights(
+    user_id: int = Depends(require_user),
+    kind: str = Query("weakness"),
+    jd_sha256: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Mean suitability score per JD, and the most common evaluation items of the given kind.
+    """
+    kinds = list(SUITABILITY_ITEMS.values()) + list(INTERVIEW_ITEMS.values())
+    if kind not in kinds:
+        return JSONResponse({"error": f"kind must be one of {', '.join(kinds)}"}, status_code=400)
+    return {
+        "jds": await db.run_sync(lambda session: average_score_by_jd(session, user_id)),
+        "common": await db.run_sync(lambda session: common_items(session, user_id, kind, jd_sha256, limit)),
+    }
+
+
+@router.get("/")
+async def dashboard(
+    request: Request,
+    sort: str = Query("recent"),
+    cursor: Optional[str] = None,
+    min_score: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    user_id = current_user_id(request)
+    if user_id is None:
+        return RedirectResponse(url="/auth/login", status_code=status.HTTP_303_SEE_OTHER)
+    if sort not in SORTS:
+        sort = "recent"
+    try:
+        page = await _page(db, user_id, sort, cursor, DASHBOARD_PAGE_SIZE, min_score, None, None)
+    except InvalidCursor:
+        page = await _page(db, user_id, sort, None, DASHBOARD_PAGE_SIZE, min_score, None, None)
+    return templates.TemplateResponse("dashboard.html", {
+        "request": request,
+        "uploads": page["items"],
+        "next_cursor": page["next_cursor"],
+        "sort": sort,
+        "sorts": list(SORTS),
+        "min_score": min_score,
+    })
@@ -1,59 +1,42 @@
 from fastapi import APIRouter, Request, Form, Depends
-from fastapi.responses import JSONResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from app.services.question_generator import generate_questions
-from app.services.evaluator import evaluate_interview
-from app.services.pdf_utils import read_pdf_text
-from app.db import SessionLocal, Upload
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.services import llm_client
+from app.services.jobs import active_job, enqueue
+from app.services.results import (
+    load_questions, save_answer, save_answer_scores, save_questions, save_interview_evaluation, stored_answer_scores,
+)
+from app.services.question_generator import ai_enabled, build_question_prompt, clean_question_line, _fallback_questions
+from app.services import question_bank
+from app.services.evaluator import (
+    build_summary_prompt, evaluation_from_data, extract_sections, fallback_evaluation, flag_fallback, overall_score,
+    score_answers,
+)
+from app.services.structured_output import EvaluationResult, parse_or_reask, parse_questions
+from app.services.text_extraction import get_upload_texts
+from app.db import SessionLocal, get_async_db, Upload
+from app.services.metrics import TimedJinja2Templates, stage
+import asyncio
 import json
+import logging
+import time
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# ✅ Default fallback if AI fails
-DEFAULT_QUESTIONS = [
-    "Tell me about yourself.",
-    "Describe a project you worked on.",
-    "What is your greatest strength?",
-    "What is your greatest weakness?",
-    "Why do you want this job?"
-]
+templates = TimedJinja2Templates(directory="app/templates")
+logger = logging.getLogger(__name__)
 
 @router.get("/start/{upload_id}")
-async def interview_start(request: Request, upload_id: int, db: Session = Depends(get_db)):
-    upload = db.query(Upload).filter(Upload.id == upload_id).first()
+async def interview_start(request: Request, upload_id: int, db: AsyncSession = Depends(get_async_db)):
+    upload = await db.get(Upload, upload_id)
     if not upload:
         return JSONResponse({"error": "Upload ID not found"}, status_code=404)
 
-    try:
-        questions = json.loads(upload.questions) if upload.questions else []
-    except Exception:
-        questions = []
-
-    # ✅ Always guarantee some questions
+    # ✅ Missing questions are streamed in by the page from /interview/stream/questions,
+    # unless the question bank can serve the whole interview right away
+    questions = await db.run_sync(load_questions, upload_id)
     if not questions:
-        resume_text = read_pdf_text(upload.resume_path)
-        jd_text = read_pdf_text(upload.jd_path)
-        questions = generate_questions(resume_text, jd_text, n=5)
-        if not questions:
-            questions = [
-                "Tell me about yourself.",
-                "Describe a project you worked on.",
-                "What is your greatest strength?",
-                "What is your greatest weakness?",
-                "Why do you want this job?"
-            ]
-        upload.questions = json.dumps(questions, ensure_ascii=False)
-        db.add(upload)
-        db.commit()
+        questions = await run_in_threadpool(_questions_from_bank, upload_id) or []
 
     return templates.TemplateResponse("interview.html", {
         "request": request,
@@ -62,7 +45,7 @@ async def interview_start(request: Request, upload_id: int, db: Session = Depend
     })
 
 @router.post("/submit")
-async def interview_submit(request: Request, db: Session = Depends(get_db)):
+async def interview_submit(request: Request, db: AsyncSession = Depends(get_async_db)):
     try:
         data = await request.json()
         upload_id = data.get("upload_id")
@@ -71,50 +54,252 @@ async def interview_submit(request: Request, db: Session = Depends(get_db)):
         if not upload_id or not qa_list:
             return JSONResponse({"error": "Missing upload_id or answers"}, status_code=400)
 
-        upload = db.query(Upload).filter(Upload.id == upload_id).first()
+        upload = await db.get(Upload, int(upload_id))
         if not upload:
             return JSONResponse({"error": "Upload ID not found"}, status_code=404)
 
-        resume_text = read_pdf_text(upload.resume_path) if upload.resume_path else ""
-        jd_text = read_pdf_text(upload.jd_path) if upload.jd_path else ""
+        job = await db.run_sync(enqueue, "evaluation", upload.id, {"qa_list": qa_list})
+        return JSONResponse({"job_id": job.id, "status": job.status}, status_code=202)
+
+    except Exception as e:
+        return JSONResponse({"error": f"Submit crashed: {e}"}, status_code=500)
 
-        # ✅ Wrap evaluator safely
-        try:
-            result = evaluate_interview(resume_text, jd_text, qa_list)
-        except Exception as e:
-            result = {"score": 5, "feedback": f"Evaluation failed: {e}"}
 
-        # Save into DB
-        upload.analysis_score = result.get("score")
-        upload.analysis_summary = result.get("feedback")
-        db.add(upload)
-        db.commit()
+@router.post("/answer")
+async def interview_answer(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Records one answer as soon as it is given and grades it in the background, so the
+    final submit only has to write the summary. Poll /jobs/{job_id} for the grade.
+    """
+    data = await request.json()
+    upload_id, index = data.get("upload_id"), data.get("index")
+    question, answer = data.get("q", ""), data.get("a", "")
+    if not str(upload_id).isdigit() or not isinstance(index, int) or index < 0 or not question:
+        return JSONResponse({"error": "Missing upload_id, index or question"}, status_code=400)
 
-        return JSONResponse(result)
+    upload = await db.get(Upload, int(upload_id))
+    if not upload:
+        return JSONResponse({"error": "Upload ID not found"}, status_code=404)
 
-    except Exception as e:
-        return JSONResponse({"error": f"Submit crashed: {e}"}, status_code=500)
+    row = await db.run_sync(save_answer, upload.id, index, question, answer)
+    if row.score is not None:
+        # Same answer resubmitted; it is already graded
+        return JSONResponse({"status": "done", "score": row.score, "feedback": row.feedback})
+    job = await db.run_sync(enqueue, "answer", upload.id, {"index": index, "q": question, "a": answer})
+    return JSONResponse({"job_id": job.id, "status": job.status}, status_code=202)
 
 
 @router.post("/upload_pdfs")
-async def upload_pdfs(resume_path: str = Form(...), jd_path: str = Form(...), db: Session = Depends(get_db)):
+async def upload_pdfs(resume_path: str = Form(...), jd_path: str = Form(...), db: AsyncSession = Depends(get_async_db)):
     """
-    Accepts resume and JD paths, generates questions, and saves them in DB.
+    Accepts resume and JD paths, saves them in DB and queues question generation.
+    Poll /jobs/{job_id} for the questions.
     """
-    resume_text = read_pdf_text(resume_path)
-    jd_text = read_pdf_text(jd_path)
-
-    questions = generate_questions(resume_text, jd_text, n=5)
-    if not questions or not isinstance(questions, list):
-        questions = DEFAULT_QUESTIONS
-
-    upload = Upload(
-        resume_path=resume_path,
-        jd_path=jd_path,
-        questions=json.dumps(questions, ensure_ascii=False)
-    )
+    upload = Upload(resume_path=resume_path, jd_path=jd_path)
     db.add(upload)
-    db.commit()
-    db.refresh(upload)
+    await db.commit()
+
+    questions = await run_in_threadpool(_questions_from_bank, upload.id)
+    if questions:
+        return JSONResponse({"upload_id": upload.id, "questions": questions})
+
+    job = await db.run_sync(enqueue, "questions", upload.id)
+    return JSONResponse({"upload_id": upload.id, "job_id": job.id}, status_code=202)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _questions_from_bank(upload_id: int, n: int = 5):
+    """
+    Saves and returns a full bank-served question set for the upload, or None.
+    """
+    db = SessionLocal()
+    try:
+        upload = db.get(Upload, upload_id)
+        if not upload:
+            return None
+        questions = question_bank.bank_only_set(*get_upload_texts(upload), n=n)
+        if questions:
+            save_questions(db, upload_id, questions)
+        return questions
+    finally:
+        db.close()
+
+
+def _load_questions(upload_id: int) -> list:
+    db = SessionLocal()
+    try:
+        return load_questions(db, upload_id)
+    finally:
+        db.close()
+
+
+async def _await_questions(upload_id: int, timeout: float) -> list:
+    """
+    Waits up to timeout for a background job to save the upload's questions ([] if it doesn't).
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        questions = await run_in_threadpool(_load_questions, upload_id)
+        if questions:
+            return questions
+        await asyncio.sleep(0.25)
+    return []
+
+
+def _save_questions(upload_id: int, questions: list):
+    db = SessionLocal()
+    try:
+        if db.get(Upload, upload_id) and not load_questions(db, upload_id):
+            save_questions(db, upload_id, questions)
+    finally:
+        db.close()
+
+
+def _stored_answer_scores(upload_id: int) -> dict:
+    db = SessionLocal()
+    try:
+        return stored_answer_scores(db, upload_id)
+    finally:
+        db.close()
+
+
+def _save_answer_scores(upload_id: int, graded: list):
+    db = SessionLocal()
+    try:
+        save_answer_scores(db, upload_id, graded)
+    finally:
+        db.close()
+
+
+def _save_evaluation(upload_id: int, result: dict):
+    db = SessionLocal()
+    try:
+        upload = db.get(Upload, upload_id)
+        if upload:
+            save_interview_evaluation(db, upload, result)
+    finally:
+        db.close()
+
+
+@router.get("/stream/questions/{upload_id}")
+async def stream_questions(upload_id: int, n: int = 5, db: AsyncSession = Depends(get_async_db)):
+    """
+    Server-sent events: one `question` event per question as soon as its line is complete, then `done`.
+    """
+    upload = await db.get(Upload, upload_id)
+    if not upload:
+        return JSONResponse({"error": "Upload ID not found"}, status_code=404)
+    stored = await db.run_sync(load_questions, upload_id)
+    if not stored and await db.run_sync(active_job, upload_id, ("prepare", "questions")):
+        # The upload pipeline is already generating them; don't pay for a second model call
+        stored = await _await_questions(upload_id, llm_client.LLM_TIMEOUT_SECONDS)
+    texts = None if stored else await run_in_threadpool(get_upload_texts, upload)
+
+    async def events():
+        if stored:
+            for q in stored:
+                yield _sse("question", q)
+            yield _sse("done", {"count": len(stored)})
+            return
+
+        # Banked questions go out immediately; the model only fills the rest
+        questions = await run_in_threadpool(question_bank.retrieve, *texts, question_bank.bank_share(n))
+        for q in questions:
+            yield _sse("question", q)
+
+        generated = []
+        if len(questions) < n and ai_enabled():
+            buffer = ""
+            try:
+                with stage("prompt_build"):
+                    prompt = build_question_prompt(*texts, n=n - len(questions), avoid=questions)
+                need = n - len(questions)
+
+                def full_set(reply: str) -> bool:
+                    # Only a reply holding the whole set asked for is cached
+                    return len(parse_questions(reply, need)) == need
+
+                async for chunk in llm_client.stream(prompt, validate=full_set):
+                    buffer += chunk
+                    *lines, buffer = buffer.split("\n")
+                    for line in lines:
+                        q = clean_question_line(line)
+                        if q and len(questions) < n:
+                            questions.append(q)
+                            generated.append(q)
+                            yield _sse("question", q)
+                q = clean_question_line(buffer)
+                if q and len(questions) < n:
+                    questions.append(q)
+                    generated.append(q)
+                    yield _sse("question", q)
+            except Exception as e:
+                logger.warning("Question stream failed: %s", e)
+        if generated:
+            await run_in_threadpool(question_bank.add_questions, generated, *texts)
+
+        if len(questions) < n:
+            extra = await run_in_threadpool(question_bank.retrieve, *texts, n - len(questions), questions)
+            extra += [q for q in _fallback_questions() if q not in questions + extra][: n - len(questions) - len(extra)]
+            for q in extra:
+                questions.append(q)
+                yield _sse("question", q)
+
+        await run_in_threadpool(_save_questions, upload_id, questions)
+        yield _sse("done", {"count": len(questions)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.post("/stream/evaluate")
+async def stream_evaluation(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Server-sent events: a `section` event ({key, value}) for each evaluation field as it parses,
+    then a `result` event with the full evaluation, which is also saved. Answers already graded
+    through /interview/answer are reused; only the summary is generated here.
+    """
+    data = await request.json()
+    upload_id = data.get("upload_id")
+    qa_list = data.get("qa_list", [])
+    if not upload_id or not qa_list or not str(upload_id).isdigit():
+        return JSONResponse({"error": "Missing upload_id or answers"}, status_code=400)
+
+    upload = await db.get(Upload, int(upload_id))
+    if not upload:
+        return JSONResponse({"error": "Upload ID not found"}, status_code=404)
+    upload_id = upload.id
+    resume_text, jd_text = await run_in_threadpool(get_upload_texts, upload)
+
+    async def events():
+        graded = await score_answers(resume_text, jd_text, qa_list, await run_in_threadpool(_stored_answer_scores, upload_id))
+        await run_in_threadpool(_save_answer_scores, upload_id, graded)
+        score = overall_score(graded)
+        yield _sse("section", {"key": "score", "value": score})
+
+        result = None
+        if llm_client.is_available():
+            buffer, sent = "", {"score"}
+            try:
+                with stage("prompt_build"):
+                    prompt = build_summary_prompt(resume_text, jd_text, graded, score)
+                async for chunk in llm_client.stream(prompt, json_mode=True):
+                    buffer += chunk
+                    for key, value in extract_sections(buffer).items():
+                        if key not in sent:
+                            sent.add(key)
+                            yield _sse("section", {"key": key, "value": value})
+                parsed = await parse_or_reask(buffer, EvaluationResult, prompt)
+                result = flag_fallback(dict(evaluation_from_data(parsed.model_dump()), score=score), graded)
+            except Exception as e:
+                logger.warning("Evaluation stream failed: %s", e)
+
+        if result is None:
+            result = fallback_evaluation(qa_list, score)
+        result["answers"] = [{"q": g["q"], "score": g["score"], "feedback": g["feedback"]} for g in graded]
+        await run_in_threadpool(_save_evaluation, upload_id, result)
+        yield _sse("result", result)
 
-    return JSONResponse({"upload_id": upload.id, "questions": questions})
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,15 @@
+# app/routes/jobs.py
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from app.db import get_db, Job
+from app.services.jobs import job_status
+
+router = APIRouter()
+
+@router.get("/{job_id}")
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.get(Job, job_id)
+    if not job:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return job_status(job)
@@ -1,39 +1,40 @@
+import os
+from datetime import datetime, timedelta
+
 from fastapi import APIRouter, Request, Depends
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from app.db import SessionLocal, Upload
-from app.services.pdf_reader import extract_text
-from app.services.suitability_agent import analyze_candidate
-import json
+from app.db import get_db, Upload
+from app.services.metrics import TimedJinja2Templates
+from app.services.jobs import active_job, enqueue, job_status, latest_job
+from app.services.results import load_suitability
+
+# How long a fallback (keyword) analysis is shown before the model is tried again
+SUITABILITY_RETRY_SECONDS = float(os.getenv("SUITABILITY_RETRY_SECONDS", "300"))
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+templates = TimedJinja2Templates(directory="app/templates")
+
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _recent_fallback(db: Session, upload_id: int):
+    """
+    The fallback analysis from the upload's latest finished job, if it is recent enough to
+    show instead of retrying. Fallbacks are never stored (see results.save_suitability).
+    """
+    job = latest_job(db, upload_id, ("prepare", "suitability"), ("done",))
+    if job is None or job.updated_at < datetime.utcnow() - timedelta(seconds=SUITABILITY_RETRY_SECONDS):
+        return None
+    result = job_status(job)["result"] or {}
+    result = result.get("suitability", result) if job.kind == "prepare" else result
+    return result if result and result.get("fallback") else None
 
 @router.get("/view/{upload_id}")
 def view_suitability(request: Request, upload_id: int, db: Session = Depends(get_db)):
     upload = db.query(Upload).filter(Upload.id == upload_id).first()
     if not upload:
         return templates.TemplateResponse("suitability.html", {"request": request, "error": "Upload not found"})
-    resume_text = extract_text(upload.resume_path)
-    jd_text = extract_text(upload.jd_path)
-    result = analyze_candidate(resume_text, jd_text)
-    # save to DB
-    upload.analysis_score = result.get("score")
-    upload.analysis_summary = result.get("summary")
-    upload.strengths = json.dumps(result.get("strengths", []))
-    upload.weaknesses = json.dumps(result.get("weaknesses", []))
-    upload.recommendations = json.dumps(result.get("recommendations", []))
-    db.add(upload)
-    db.commit()
-    # convert lists back for template
-    result["strengths"] = result.get("strengths", [])
-    result["weaknesses"] = result.get("weaknesses", [])
-    result["recommendations"] = result.get("recommendations", [])
+    result = load_suitability(db, upload) or _recent_fallback(db, upload.id)
+    if result is None:
+        # Analysis runs in the background; the page polls the job and reloads when done
+        job = active_job(db, upload.id, ("prepare", "suitability")) or enqueue(db, "suitability", upload.id)
+        return templates.TemplateResponse("suitability.html", {"request": request, "job_id": job.id, "upload_id": upload_id})
     return templates.TemplateResponse("suitability.html", {"request": request, "result": result, "upload_id": upload_id})
@@ -1,28 +1,18 @@
 # app/routes/upload_routes.py
 
-import os
-import uuid
-import aiofiles
-from fastapi import APIRouter, UploadFile, File, Form, Depends, Request
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, UploadFile, File, Depends, Request
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from app.db import SessionLocal, Upload
+from app.auth import current_user_id
+from app.db import get_async_db, Upload
+from app.services.metrics import TimedJinja2Templates
+from app.services.blob_store import save_upload, UploadTooLarge
+from app.services.jobs import enqueue
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
-
-UPLOAD_DIR = "data/uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+templates = TimedJinja2Templates(directory="app/templates")
 
 @router.get("/upload_form")
 def upload_form(request: Request):
@@ -31,36 +21,35 @@ def upload_form(request: Request):
 @router.post("/upload")
 async def upload_files(
     request: Request,
-    user_id: int = Form(...),
     resume: UploadFile = File(...),
     jd: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    uid = str(uuid.uuid4())
-    folder = os.path.join(UPLOAD_DIR, uid)
-    os.makedirs(folder, exist_ok=True)
-
-    resume_path = os.path.join(folder, "resume.pdf")
-    jd_path = os.path.join(folder, "jd.pdf")
-
-    resume_bytes = await resume.read()
-    jd_bytes = await jd.read()
-
-    async with aiofiles.open(resume_path, "wb") as f:
-        await f.write(resume_bytes)
-    async with aiofiles.open(jd_path, "wb") as f:
-        await f.write(jd_bytes)
+    # Stream both files into the content-addressed blob store
+    try:
+        resume_sha256, resume_path = await save_upload(resume)
+        jd_sha256, jd_path = await save_upload(jd)
+    except UploadTooLarge as e:
+        return templates.TemplateResponse(
+            "upload.html",
+            {"request": request, "error": f"File too large: {e}"},
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
 
     record = Upload(
-        user_id=user_id,
+        # Only the verified access token decides the owner; anonymous uploads have none
+        user_id=current_user_id(request),
         resume_path=resume_path,
-        resume_blob=resume_bytes,
+        resume_sha256=resume_sha256,
         jd_path=jd_path,
-        jd_blob=jd_bytes
+        jd_sha256=jd_sha256
     )
     db.add(record)
-    db.commit()
-    db.refresh(record)
+    await db.commit()
+
+    # Start analysis and question generation now; the suitability page and the
+    # interview page pick up whatever the pipeline has finished
+    await db.run_sync(enqueue, "prepare", record.id)
 
     # Store paths in session
     request.session["resume_path"] = resume_path
@@ -0,0 +1,283 @@
+# app/services/analytics.py
+"""
+Cross-candidate analytics for one recruiter's candidates against one JD.
+
+Score moments (count, sum, sum of squares) and per-item candidate counts are
+kept in per-JD rollups (`jd_rollups`, `jd_rollup_items`). Every stored
+suitability analysis or interview evaluation folds its change into them in
+the same transaction with atomic SQL increments, so listing JDs and their
+recurring strengths/weaknesses never scans candidates.
+
+Reports add what cannot be summed incrementally: score percentiles and
+histograms, and which questions separate strong from weak candidates. These
+are computed with NumPy over single-column bulk reads (an index-only scan for
+suitability scores), not by loading Upload rows.
+"""
+import os
+from operator import itemgetter
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, text, update
+from sqlalchemy.orm import Session
+
+from app.db import AnswerEvaluation, InterviewEvaluation, JdRollup, JdRollupItem, Upload
+
+ANALYTICS_TOP_ITEMS = int(os.getenv("ANALYTICS_TOP_ITEMS", "10"))
+# Answers needed from both strong and weak candidates before a question is ranked
+ANALYTICS_MIN_ANSWERS = int(os.getenv("ANALYTICS_MIN_ANSWERS", "3"))
+
+SCALES = {"suitability": 100, "interview": 10}
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+
+# (kind, normalized, text) of an EvaluationItem
+Item = Tuple[str, str, str]
+
+
+def _insert(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _rollup_id(db: Session, user_id: int, jd_sha256: str) -> int:
+    insert = _insert(db)
+    db.execute(
+        insert(JdRollup)
+        .values(user_id=user_id, jd_sha256=jd_sha256)
+        .on_conflict_do_nothing(index_elements=["user_id", "jd_sha256"])
+    )
+    return db.execute(
+        select(JdRollup.id).where(JdRollup.user_id == user_id, JdRollup.jd_sha256 == jd_sha256)
+    ).scalar_one()
+
+
+def record_result(db: Session, upload: Upload, scale: str, old_score: Optional[int], new_score: Optional[int],
+                  removed: Iterable[Item] = (), added: Iterable[Item] = ()):
+    """
+    Folds one upload's changed result into its JD rollup; the caller commits. `removed` and
+    `added` are the evaluation items the result replaced and stored.
+    """
+    if upload.user_id is None or not upload.jd_sha256:
+        return
+    rollup_id = _rollup_id(db, upload.user_id, upload.jd_sha256)
+
+    count, total, squares = (getattr(JdRollup, f"{scale}_{name}") for name in ("count", "sum", "sumsq"))
+    old, new = old_score or 0, new_score or 0
+    db.execute(update(JdRollup).where(JdRollup.id == rollup_id).values({
+        count: count + (new_score is not None) - (old_score is not None),
+        total: total + new - old,
+        squares: squares + new * new - old * old,
+    }))
+
+    # Counted once per candidate, however often an item repeats in one result
+    before = {(kind, normalized) for kind, normalized, _ in removed}
+    after = {(kind, normalized): item_text for kind, normalized, item_text in added}
+    insert = _insert(db)
+    for key in before.symmetric_difference(after):
+        kind, normalized = key
+        stmt = insert(JdRollupItem).values(
+            rollup_id=rollup_id, kind=kind, normalized=normalized, text=after.get(key, normalized),
+            count=1 if key in after else -1,
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["rollup_id", "kind", "normalized"],
+            set_={"count": JdRollupItem.count + stmt.excluded.count},
+        ))
+
+
+def rebuild_rollups(conn):
+    """
+    Recomputes every rollup from the result tables (backfill and repair).
+    """
+    conn.execute(text("DELETE FROM jd_rollup_items"))
+    conn.execute(text("DELETE FROM jd_rollups"))
+    conn.execute(text("""
+        INSERT INTO jd_rollups (user_id, jd_sha256, suitability_count, suitability_sum, suitability_sumsq,
+                                interview_count, interview_sum, interview_sumsq, updated_at)
+        SELECT u.user_id, u.jd_sha256,
+               COUNT(u.analysis_score), COALESCE(SUM(u.analysis_score), 0),
+               COALESCE(SUM(u.analysis_score * u.analysis_score), 0),
+               COUNT(e.score), COALESCE(SUM(e.score), 0), COALESCE(SUM(e.score * e.score), 0),
+               CURRENT_TIMESTAMP
+        FROM uploads u LEFT JOIN interview_evaluations e ON e.upload_id = u.id
+        WHERE u.user_id IS NOT NULL AND u.jd_sha256 IS NOT NULL
+        GROUP BY u.user_id, u.jd_sha256
+    """))
+    conn.execute(text("""
+        INSERT INTO jd_rollup_items (rollup_id, kind, normalized, text, count)
+        SELECT r.id, i.kind, i.normalized, MIN(i.text), COUNT(DISTINCT i.upload_id)
+        FROM evaluation_items i
+        JOIN uploads u ON u.id = i.upload_id
+        JOIN jd_rollups r ON r.user_id = u.user_id AND r.jd_sha256 = u.jd_sha256
+        GROUP BY r.id, i.kind, i.normalized
+    """))
+
+
+def _moments(rollup: JdRollup, scale: str) -> dict:
+    n = getattr(rollup, f"{scale}_count")
+    if not n:
+        return {"count": 0, "mean": None, "std": None}
+    mean = getattr(rollup, f"{scale}_sum") / n
+    variance = max(getattr(rollup, f"{scale}_sumsq") / n - mean * mean, 0.0)
+    return {"count": n, "mean": round(mean, 2), "std": round(variance ** 0.5, 2)}
+
+
+def _distribution(rollup: JdRollup, scale: str, scores: np.ndarray) -> dict:
+    out = _moments(rollup, scale)
+    if scores.size:
+        counts, edges = np.histogram(scores, bins=HISTOGRAM_BINS, range=(0, SCALES[scale]))
+        out["percentiles"] = dict(zip(
+            (f"p{p}" for p in PERCENTILES), np.round(np.percentile(scores, PERCENTILES), 2).tolist()
+        ))
+        out["histogram"] = {"edges": edges.tolist(), "counts": counts.tolist()}
+    return out
+
+
+def list_rollups(db: Session, user_id: int) -> List[dict]:
+    """
+    Every JD the user has candidates for, from the rollups alone.
+    """
+    rollups = db.execute(
+        select(JdRollup).where(JdRollup.user_id == user_id).order_by(JdRollup.suitability_count.desc())
+    ).scalars().all()
+    return [
+        {
+            "jd_sha256": r.jd_sha256,
+            "suitability": _moments(r, "suitability"),
+            "interview": _moments(r, "interview"),
+            "updated_at": r.updated_at.isoformat() if r.updated_at else None,
+        }
+        for r in rollups
+    ]
+
+
+def top_items(db: Session, rollup_id: int, kind: str, limit: int) -> List[dict]:
+    rows = db.execute(
+        select(JdRollupItem.text, JdRollupItem.count)
+        .where(JdRollupItem.rollup_id == rollup_id, JdRollupItem.kind == kind, JdRollupItem.count > 0)
+        .order_by(JdRollupItem.count.desc())
+        .limit(limit)
+    ).all()
+    return [{"text": item_text, "candidates": count} for item_text, count in rows]
+
+
+def question_separation(upload_ids: np.ndarray, questions: List[str], scores: np.ndarray,
+                        min_answers: int = ANALYTICS_MIN_ANSWERS) -> List[dict]:
+    """
+    Ranks questions by how differently strong and weak candidates answered them.
+
+    Candidates are split at the median of their mean answer grade. For each question:
+    the mean grade among strong and weak candidates, their difference (`separation`),
+    and the correlation between the question's grade and the candidate's grade on the
+    rest of the interview (`rest_correlation`). Questions with fewer than min_answers
+    answers in either group are left out.
+    """
+    if not len(scores):
+        return []
+    # Factorize the raw texts, then merge texts that differ only in case/whitespace
+    raw: dict = {}
+    raw_inv = np.fromiter((raw.setdefault(q, len(raw)) for q in questions), dtype=np.int64, count=len(questions))
+    index: dict = {}
+    labels = []
+    codes = np.empty(len(raw), dtype=np.int64)
+    for q, i in raw.items():
+        key = " ".join(q.lower().split())
+        if key not in index:
+            index[key] = len(labels)
+            labels.append(q)
+        codes[i] = index[key]
+    q_inv = codes[raw_inv]
+    nq = len(labels)
+
+    _, u_inv = np.unique(upload_ids, return_inverse=True)
+    u_count = np.bincount(u_inv)
+    u_sum = np.bincount(u_inv, weights=scores)
+    overall = u_sum / u_count
+    strong = (overall >= np.median(overall))[u_inv]
+
+    def group(mask):
+        n = np.bincount(q_inv[mask], minlength=nq)
+        total = np.bincount(q_inv[mask], weights=scores[mask], minlength=nq)
+        return n, total
+
+    n_strong, sum_strong = group(strong)
+    n_weak, sum_weak = group(~strong)
+
+    # Item-rest correlation, from grouped sums over answers whose candidate answered something else too
+    has_rest = u_count[u_inv] > 1
+    x = scores[has_rest]
+    y = ((u_sum[u_inv] - scores) / np.maximum(u_count[u_inv] - 1, 1))[has_rest]
+    q = q_inv[has_rest]
+    n = np.bincount(q, minlength=nq)
+    sx, sy = np.bincount(q, x, nq), np.bincount(q, y, nq)
+    sxx, syy, sxy = np.bincount(q, x * x, nq), np.bincount(q, y * y, nq), np.bincount(q, x * y, nq)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_strong = sum_strong / n_strong
+        mean_weak = sum_weak / n_weak
+        separation = mean_strong - mean_weak
+        r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+        mean = (sum_strong + sum_weak) / (n_strong + n_weak)
+
+    ranked = np.flatnonzero((n_strong >= min_answers) & (n_weak >= min_answers))
+    ranked = ranked[np.argsort(-separation[ranked], kind="stable")]
+    return [
+        {
+            "question": labels[i],
+            "answers": int(n_strong[i] + n_weak[i]),
+            "mean_score": round(float(mean[i]), 2),
+            "strong_mean": round(float(mean_strong[i]), 2),
+            "weak_mean": round(float(mean_weak[i]), 2),
+            "separation": round(float(separation[i]), 2),
+            "rest_correlation": round(float(r[i]), 3) if np.isfinite(r[i]) else None,
+        }
+        for i in ranked
+    ]
+
+
+def _scores(db: Session, stmt) -> np.ndarray:
+    return np.fromiter(db.connection().execute(stmt).scalars(), dtype=np.float64)
+
+
+def jd_report(db: Session, user_id: int, jd_sha256: str, top: int = ANALYTICS_TOP_ITEMS) -> Optional[dict]:
+    """
+    Score distributions, recurring strengths/weaknesses and the most discriminating
+    interview questions for one JD, or None if the user has no candidates for it.
+    """
+    rollup = db.execute(
+        select(JdRollup).where(JdRollup.user_id == user_id, JdRollup.jd_sha256 == jd_sha256)
+    ).scalar_one_or_none()
+    if rollup is None:
+        return None
+    for_jd = (Upload.user_id == user_id, Upload.jd_sha256 == jd_sha256)
+
+    suitability = _scores(db, select(Upload.analysis_score).where(*for_jd, Upload.analysis_score.isnot(None)))
+    interview = _scores(db, (
+        select(InterviewEvaluation.score)
+        .join(Upload, Upload.id == InterviewEvaluation.upload_id)
+        .where(*for_jd, InterviewEvaluation.score.isnot(None))
+    ))
+    # Plain Core rows: this is the one pull that grows with candidates x questions
+    answers = db.connection().execute(
+        select(AnswerEvaluation.upload_id, AnswerEvaluation.question, AnswerEvaluation.score)
+        .join(Upload, Upload.id == AnswerEvaluation.upload_id)
+        .where(*for_jd, AnswerEvaluation.score.isnot(None))
+    ).all()
+
+    return {
+        "jd_sha256": jd_sha256,
+        "suitability": _distribution(rollup, "suitability", suitability),
+        "interview": _distribution(rollup, "interview", interview),
+        "strengths": top_items(db, rollup.id, "strength", top),
+        "weaknesses": top_items(db, rollup.id, "weakness", top),
+        "improvements": top_items(db, rollup.id, "improvement", top),
+        "questions": question_separation(
+            np.fromiter(map(itemgetter(0), answers), dtype=np.int64, count=len(answers)),
+            list(map(itemgetter(1), answers)),
+            np.fromiter(map(itemgetter(2), answers), dtype=np.float64, count=len(answers)),
+        )[:top],
+    }
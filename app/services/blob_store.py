@@ -0,0 +1,149 @@
+# app/services/blob_store.py
+"""
+Content-addressed storage for uploaded documents.
+
+Files are referenced by the SHA-256 of their bytes. Uploads are streamed to a
+temporary file in chunks while being hashed, then committed under their hash,
+so identical documents are stored once and nothing is held fully in memory.
+"""
+import hashlib
+import os
+import uuid
+from typing import Dict, Optional, Tuple
+
+import aiofiles
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+BLOB_STORE = os.getenv("BLOB_STORE", "local")
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "data/blobs")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class BlobStore:
+    """
+    Interface for blob backends. `path_for` must return a local path readable by the text extractors.
+    """
+
+    def path_for(self, sha256: str) -> str:
+        raise NotImplementedError
+
+    def exists(self, sha256: str) -> bool:
+        raise NotImplementedError
+
+    def temp_path(self) -> str:
+        raise NotImplementedError
+
+    def commit(self, temp_path: str, sha256: str) -> str:
+        raise NotImplementedError
+
+    def put_bytes(self, data: bytes) -> Tuple[str, str]:
+        sha256 = hashlib.sha256(data).hexdigest()
+        if not self.exists(sha256):
+            tmp = self.temp_path()
+            with open(tmp, "wb") as f:
+                f.write(data)
+            self.commit(tmp, sha256)
+        return sha256, self.path_for(sha256)
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Stores blobs as <root>/<sha[:2]>/<sha>.
+    """
+
+    def __init__(self, root: str = BLOB_STORE_DIR):
+        self.root = root
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+
+    def path_for(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path_for(sha256))
+
+    def temp_path(self) -> str:
+        return os.path.join(self.root, "tmp", uuid.uuid4().hex)
+
+    def commit(self, temp_path: str, sha256: str) -> str:
+        final = self.path_for(sha256)
+        if os.path.exists(final):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            os.replace(temp_path, final)
+        return final
+
+
+_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    global _store
+    if _store is None:
+        if BLOB_STORE != "local":
+            raise ValueError(f"Unknown BLOB_STORE '{BLOB_STORE}'")
+        _store = LocalBlobStore()
+    return _store
+
+
+async def save_upload(upload, max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[str, str]:
+    """
+    Streams a Starlette UploadFile into the blob store.
+    Returns (sha256, path). Raises UploadTooLarge past max_bytes.
+    """
+    store = get_blob_store()
+    tmp = store.temp_path()
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp, "wb") as f:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"{upload.filename} exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    sha256 = digest.hexdigest()
+    return sha256, store.commit(tmp, sha256)
+
+
+def request_limit(files: int) -> int:
+    """
+    Largest acceptable multipart body carrying up to `files` uploads.
+    """
+    return files * MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Pure ASGI middleware that answers 413 when an upload route's Content-Length is over its
+    limit ({path: bytes}), before the multipart body is received and spooled to disk.
+    save_upload still checks every file as it streams, for bodies sent without a length.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is not None:
+            length = Headers(scope=scope).get("content-length", "")
+            if length.isdigit() and int(length) > limit:
+                response = JSONResponse({"error": f"Request body exceeds {limit} bytes"}, status_code=413)
+                return await response(scope, receive, send)
+        await self.app(scope, receive, send)
@@ -0,0 +1,199 @@
+# app/services/context_selector.py
+"""
+Picks the parts of a resume / JD worth sending to the model.
+
+Instead of blindly slicing the first N characters, both documents are split
+into chunks, each chunk is scored with BM25 against the other document, and
+the best chunks are packed (in reading order) into a token budget. Chunk
+indexes are cached by text hash, so an upload is indexed once no matter how
+many prompts are built from it.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.metrics import inc
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "750"))  # resume + JD, per prompt
+CONTEXT_RESUME_SHARE = float(os.getenv("CONTEXT_RESUME_SHARE", "0.5"))
+CONTEXT_CHUNK_WORDS = int(os.getenv("CONTEXT_CHUNK_WORDS", "60"))
+CONTEXT_INDEX_CACHE_SIZE = int(os.getenv("CONTEXT_INDEX_CACHE_SIZE", "256"))
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+CHARS_PER_TOKEN = 4  # rough average for English text
+
+_TERM_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+_STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or our that the their this to was
+were will with you your we us they them he she i my me not but if so than then there these those
+""".split())
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TERM_RE.findall(text.lower()) if t not in _STOPWORDS and len(t) > 1]
+
+
+def chunk_text(text: str, max_words: int = CONTEXT_CHUNK_WORDS) -> List[str]:
+    """
+    Splits on lines (bullets, headings), merging short ones and splitting long ones
+    so each chunk holds roughly max_words words.
+    """
+    chunks, current, count = [], [], 0
+    for line in text.splitlines():
+        words = line.split()
+        if not words:
+            continue
+        while len(words) > max_words:
+            if current:
+                chunks.append(" ".join(current))
+                current, count = [], 0
+            chunks.append(" ".join(words[:max_words]))
+            words = words[max_words:]
+        if count + len(words) > max_words and current:
+            chunks.append(" ".join(current))
+            current, count = [], 0
+        current.extend(words)
+        count += len(words)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _bm25_weights(term_lists: List[List[str]]) -> Tuple[Dict[str, int], np.ndarray]:
+    """
+    Vocabulary plus the doc x term matrix of idf-scaled saturated term frequencies,
+    so scoring a query against every doc is one matvec.
+    """
+    vocab: Dict[str, int] = {}
+    for terms in term_lists:
+        for t in terms:
+            vocab.setdefault(t, len(vocab))
+
+    n = len(term_lists)
+    tf = np.zeros((n, len(vocab)), dtype=np.float32)
+    for i, terms in enumerate(term_lists):
+        for t in terms:
+            tf[i, vocab[t]] += 1.0
+
+    if n == 0 or not vocab:
+        return vocab, tf
+
+    lengths = tf.sum(axis=1, keepdims=True)
+    avg_len = max(float(lengths.mean()), 1.0)
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths / avg_len)
+    return vocab, (tf * (BM25_K1 + 1.0) / (tf + norm)) * idf
+
+
+def _query_vector(vocab: Dict[str, int], query_text: str) -> np.ndarray:
+    q = np.zeros(len(vocab), dtype=np.float32)
+    for t in tokenize(query_text):
+        idx = vocab.get(t)
+        if idx is not None:
+            q[idx] = 1.0  # presence only, so a term repeated in the query doesn't dominate
+    return q
+
+
+class ChunkIndex:
+    """
+    BM25 index over the chunks of one document.
+    """
+
+    def __init__(self, text: str):
+        self.chunks = chunk_text(text)
+        self.tokens = [estimate_tokens(c) for c in self.chunks]
+        self.vocab, self.weights = _bm25_weights([tokenize(c) for c in self.chunks])
+
+    def scores(self, query_text: str) -> np.ndarray:
+        return self.weights @ _query_vector(self.vocab, query_text)
+
+
+def rank_documents(texts: List[str], query_text: str) -> np.ndarray:
+    """
+    BM25 score of each whole document against query_text, with idf taken over the given documents.
+    """
+    vocab, weights = _bm25_weights([tokenize(t or "") for t in texts])
+    return weights @ _query_vector(vocab, query_text)
+
+
+_cache: "OrderedDict[str, ChunkIndex]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_index(text: str) -> ChunkIndex:
+    """
+    Cached by content hash: uploads are content-addressed, so this is effectively per upload
+    (and shared by candidates applying against the same JD).
+    """
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is not None:
+            _cache.move_to_end(key)
+            return index
+    index = ChunkIndex(text)
+    with _cache_lock:
+        _cache[key] = index
+        while len(_cache) > CONTEXT_INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+def select_chunks(text: str, query_text: str, budget_tokens: int) -> str:
+    """
+    The highest scoring chunks of text that fit in budget_tokens, in their original order.
+    Text already within budget is returned unchanged.
+    """
+    if not text or estimate_tokens(text) <= budget_tokens:
+        return text or ""
+
+    index = get_index(text)
+    scores = index.scores(query_text)
+    # Stable sort: equal scores (e.g. no overlap at all) keep document order
+    order = np.argsort(-scores, kind="stable")
+
+    picked, used = [], 0
+    for i in order:
+        cost = index.tokens[i]
+        if used + cost > budget_tokens:
+            continue
+        picked.append(int(i))
+        used += cost
+    picked.sort()
+    return "\n".join(index.chunks[i] for i in picked)
+
+
+def select_context(resume_text: str, jd_text: str, budget_tokens: Optional[int] = None) -> Tuple[str, str]:
+    """
+    (resume_context, jd_context) for a prompt: resume chunks ranked against the JD,
+    JD chunks ranked against the resume. Unused resume budget goes to the JD and vice versa.
+    """
+    budget = budget_tokens or CONTEXT_TOKEN_BUDGET
+    resume_text, jd_text = resume_text or "", jd_text or ""
+    resume_budget = int(budget * CONTEXT_RESUME_SHARE)
+    jd_budget = budget - resume_budget
+
+    resume_tokens, jd_tokens = estimate_tokens(resume_text), estimate_tokens(jd_text)
+    if resume_tokens < resume_budget:
+        jd_budget += resume_budget - resume_tokens
+    elif jd_tokens < jd_budget:
+        resume_budget += jd_budget - jd_tokens
+
+    resume_ctx = select_chunks(resume_text, jd_text, resume_budget)
+    jd_ctx = select_chunks(jd_text, resume_text, jd_budget)
+
+    saved = resume_tokens + jd_tokens - estimate_tokens(resume_ctx) - estimate_tokens(jd_ctx)
+    inc("prompt_context_tokens_saved_total", "Estimated input tokens dropped by context selection", max(saved, 0))
+    return resume_ctx, jd_ctx
+
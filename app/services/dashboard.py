@@ -0,0 +1,167 @@
+# app/services/dashboard.py
+"""
+Per-user upload listings for the candidate dashboard.
+
+Pages use keyset pagination: the cursor holds the (sort value, id) of the
+last row shown and the next page starts strictly after it, so each page
+costs the same index range scan however deep the recruiter has paged. Only
+the summary columns are loaded; the analysis summary and file paths stay
+unread. Sorting by score lists analysed candidates only (unscored uploads
+have no place in a score order).
+
+The insights aggregates are read from the per-JD rollups (see
+app/services/analytics.py), so they always agree with /analytics.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session, load_only
+
+from app.db import JdRollup, JdRollupItem, Upload
+from app.services.analytics import list_rollups
+
+DASHBOARD_PAGE_SIZE = 25
+DASHBOARD_MAX_PAGE_SIZE = 100
+
+# sort name -> (column, descending)
+SORTS = {
+    "recent": (Upload.created_at, True),
+    "oldest": (Upload.created_at, False),
+    "score": (Upload.analysis_score, True),
+    "score_asc": (Upload.analysis_score, False),
+}
+
+_SUMMARY_COLUMNS = (
+    Upload.id,
+    Upload.created_at,
+    Upload.analysis_score,
+    Upload.analyzed_at,
+    Upload.resume_filename,
+    Upload.batch_id,
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort: str, value, upload_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, upload_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str):
+    """
+    (value, id) from a cursor issued for the same sort. Raises InvalidCursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, upload_id = json.loads(raw)
+        if cursor_sort != sort:
+            raise ValueError("cursor was issued for another sort order")
+        if SORTS[sort][0] is Upload.created_at:
+            value = datetime.fromisoformat(value)
+        return value, int(upload_id)
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor(str(e)) from None
+
+
+def list_uploads(db: Session, user_id: int, sort: str = "recent", cursor: Optional[str] = None,
+                 limit: int = DASHBOARD_PAGE_SIZE, min_score: Optional[int] = None,
+                 max_score: Optional[int] = None, analyzed: Optional[bool] = None) -> dict:
+    """
+    One page of a user's uploads: {"items": [...], "next_cursor": str or None}.
+    Raises InvalidCursor for a malformed cursor and KeyError for an unknown sort.
+    """
+    column, descending = SORTS[sort]
+    limit = max(1, min(limit, DASHBOARD_MAX_PAGE_SIZE))
+
+    stmt = select(Upload).options(load_only(*_SUMMARY_COLUMNS)).where(Upload.user_id == user_id)
+    if column is Upload.analysis_score:
+        stmt = stmt.where(Upload.analysis_score.isnot(None))
+    if min_score is not None:
+        stmt = stmt.where(Upload.analysis_score >= min_score)
+    if max_score is not None:
+        stmt = stmt.where(Upload.analysis_score <= max_score)
+    if analyzed is not None:
+        stmt = stmt.where(Upload.analyzed_at.isnot(None) if analyzed else Upload.analyzed_at.is_(None))
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        key, after = tuple_(column, Upload.id), tuple_(value, last_id)
+        stmt = stmt.where(key < after if descending else key > after)
+    if descending:
+        stmt = stmt.order_by(column.desc(), Upload.id.desc())
+    else:
+        stmt = stmt.order_by(column.asc(), Upload.id.asc())
+
+    rows = db.execute(stmt.limit(limit + 1)).scalars().all()
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(sort, getattr(last, column.key), last.id)
+    return {
+        "items": [
+            {
+                "id": u.id,
+                "filename": u.resume_filename,
+                "score": u.analysis_score,
+                "analyzed": u.analyzed_at is not None,
+                "batch_id": u.batch_id,
+                "created_at": u.created_at.isoformat() if u.created_at else None,
+            }
+            for u in page
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+def average_score_by_jd(db: Session, user_id: int, limit: int = 20) -> list:
+    """
+    Candidates and mean suitability score per job description (by JD content hash),
+    most candidates first. Scores come from the JD rollups.
+    """
+    candidates = func.count(Upload.id).label("candidates")
+    rows = db.execute(
+        select(Upload.jd_sha256, candidates)
+        .where(Upload.user_id == user_id, Upload.jd_sha256.isnot(None))
+        .group_by(Upload.jd_sha256)
+        .order_by(candidates.desc())
+        .limit(limit)
+    ).all()
+    scores = {r["jd_sha256"]: r["suitability"] for r in list_rollups(db, user_id)}
+    out = []
+    for jd, count in rows:
+        moments = scores.get(jd) or {"count": 0, "mean": None}
+        out.append({
+            "jd_sha256": jd,
+            "candidates": count,
+            "scored": moments["count"],
+            "average_score": round(moments["mean"], 1) if moments["mean"] is not None else None,
+        })
+    return out
+
+
+def common_items(db: Session, user_id: int, kind: str = "weakness", jd_sha256: Optional[str] = None,
+                 limit: int = 10) -> list:
+    """
+    The evaluation items (e.g. weaknesses) shared by the most of a user's candidates, by
+    normalized text, from the JD rollups.
+    """
+    candidates = func.sum(JdRollupItem.count).label("candidates")
+    stmt = (
+        select(JdRollupItem.normalized, func.min(JdRollupItem.text), candidates)
+        .join(JdRollup, JdRollup.id == JdRollupItem.rollup_id)
+        .where(JdRollup.user_id == user_id, JdRollupItem.kind == kind, JdRollupItem.count > 0)
+    )
+    if jd_sha256:
+        stmt = stmt.where(JdRollup.jd_sha256 == jd_sha256)
+    rows = db.execute(
+        stmt.group_by(JdRollupItem.normalized).order_by(candidates.desc()).limit(limit)
+    ).all()
+    return [{"text": text, "candidates": count} for _, text, count in rows]
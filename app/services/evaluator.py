@@ -1,110 +1,78 @@
 # app/services/evaluator.py
-import os
+import asyncio
 import json
+import logging
 import re
-import ast
-from dotenv import load_dotenv
-
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
-
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash-lite")
-print("GEMINI_API_KEY:", API_KEY)
-print("GEMINI_MODEL:", MODEL)
-
-if genai and API_KEY:
-    genai.configure(api_key=API_KEY)
-
-
-def safe_parse_json(json_str: str):
-    """
-    Safely extracts and parses JSON from Gemini responses, removing code fences, extra text,
-    and handling unescaped characters or smart quotes.
-    """
-    if not json_str:
-        return None
-
-    # Remove leading text before first ```
-    json_str = re.sub(r'^.*?```', '```', json_str.strip(), flags=re.DOTALL)
-
-    # Extract JSON inside ```json ... ```
-    match = re.search(r'```json(.*?)```', json_str, flags=re.DOTALL)
-    if match:
-        json_str = match.group(1)
-    else:
-        # Fallback: try everything between first { and last }
-        start = json_str.find("{")
-        end = json_str.rfind("}")
-        if start == -1 or end == -1 or end <= start:
-            return None
-        json_str = json_str[start:end+1]
-
-    # Replace newlines and smart quotes
-    json_str = json_str.replace('\n', ' ').replace('\r', '')
-    json_str = json_str.replace('“', '"').replace('”', '"').replace('’', "'")
-
-    try:
-        return json.loads(json_str)
-    except json.JSONDecodeError as e:
-        print("Final JSON parse failed:", e)
-        return None
-
-
-def parse_gemini_response(resp):
-    text = getattr(resp, "text", None) or str(resp)
-    # Remove markdown code fences and leading 'json' if present
-    text = re.sub(r"^```json|^```|```$", "", text.strip(), flags=re.MULTILINE).strip()
-    # Find the first and last curly braces to extract JSON
-    start = text.find("{")
-    end = text.rfind("}")
-
-    if start != -1 and end != -1 and end > start:
-        json_str = text[start:end+1]
-        # Replace escaped newlines and double backslashes
-        json_str = json_str.replace('\\n', ' ').replace('\\\\', '\\')
-        try:
-            return json.loads(json_str)
-        except Exception as e:
-            print("json.loads failed:", e)
-            try:
-                return ast.literal_eval(json_str)
-            except Exception as e2:
-                print("ast.literal_eval failed:", e2)
-                print("Gemini response was:", json_str)
-    return None
-    
-def evaluate_interview(resume_text: str, jd_text: str, qa_list: list):
-    """
-    Returns a dict with detailed evaluation fields if AI is available,
-    otherwise uses a simple heuristic fallback.
-    """
-    if genai and API_KEY:
-        prompt = f"""
-        You are an expert technical interviewer and evaluator.
+from app.services import llm_client, structured_output
+from app.services.structured_output import AnswerResult, EvaluationResult
+from app.services.context_selector import CONTEXT_TOKEN_BUDGET, select_context
+from app.services.metrics import inc, stage
+
+logger = logging.getLogger(__name__)
+
+
+# Per-answer and summary prompts each carry a smaller slice of the resume/JD
+ANSWER_CONTEXT_BUDGET = CONTEXT_TOKEN_BUDGET // 2
+ANSWER_EXCERPT_CHARS = 300
+
+EVALUATION_KEYS = ["summary", "positives", "improvements", "preparation_needed", "detailed_evaluation", "score", "feedback"]
+
+
+def build_answer_prompt(resume_text: str, jd_text: str, question: str, answer: str) -> str:
+    resume_text, jd_text = select_context(resume_text, jd_text, ANSWER_CONTEXT_BUDGET)
+    return f"""
+        You are an expert technical interviewer grading a single answer from a mock interview.
+
+        Candidate resume (most relevant excerpts):
+        {resume_text}
+
+        Job description (most relevant excerpts):
+        {jd_text}
+
+        Question:
+        {question}
+
+        Candidate answer:
+        {answer or "(no answer given)"}
+
+        Grade only this answer: correctness, depth and relevance to the role.
+        Respond ONLY with valid JSON (no markdown, no code fences):
+
+        {{"score": <integer 0-10>, "feedback": "<2-3 sentences: what was good and what was missing>"}}
+        """
+
 
-        Candidate resume (truncated):
-        {resume_text[:1500]}
+def build_summary_prompt(resume_text: str, jd_text: str, graded: list, score: int) -> str:
+    resume_text, jd_text = select_context(resume_text, jd_text, ANSWER_CONTEXT_BUDGET)
+    answers = [
+        {
+            "question": g["q"],
+            "answer_excerpt": (g["a"] or "")[:ANSWER_EXCERPT_CHARS],
+            "score": g["score"],
+            "feedback": g["feedback"],
+        }
+        for g in graded
+    ]
+    return f"""
+        You are an expert technical interviewer writing the final evaluation of a mock interview.
+        Every answer has already been graded individually (0-10):
 
-        Job description (truncated):
-        {jd_text[:1500]}
+        {json.dumps(answers, ensure_ascii=False, indent=2)}
 
-        Interview data (questions and candidate answers):
-        {json.dumps(qa_list, ensure_ascii=False, indent=2)}
+        Candidate resume (most relevant excerpts):
+        {resume_text}
 
-        Your task is to provide an extremely detailed, structured, and point-wise evaluation
-        of the candidate's interview performance. Be exhaustive, analytical, and specific.
-        Follow these steps:
+        Job description (most relevant excerpts):
+        {jd_text}
+
+        Based on these per-answer grades:
 
         1. Summarize candidate performance in the interview (max 3 sentences).
         2. List at least 3 positives, with crisp explanations.
         3. List at least 3 improvements needed, crisp explanations.
-        4. Suggest at least 8 further preparation areas, detailed explanations.
-        5. Provide a very precise evaluation (max 100 words, max 3 sentences).
-        6. Give an overall score (0-10) and summary feedback (min 4 sentences).
+        4. Suggest at least 5 further preparation areas.
+        5. Provide a precise evaluation (max 100 words, max 3 sentences).
+        6. The overall score is {score} (the mean of the grades); give summary feedback (min 4 sentences).
 
         Respond ONLY with valid JSON (no markdown, no code fences) with keys:
 
@@ -114,36 +82,49 @@ def evaluate_interview(resume_text: str, jd_text: str, qa_list: list):
           "improvements": ["<improvement 1>", ...],
           "preparation_needed": ["<topic 1>", ...],
           "detailed_evaluation": "<detailed evaluation>",
-          "score": <integer 0-10>,
+          "score": {score},
           "feedback": "<overall feedback>"
         }}
 
         """
 
-        try:
-            model = genai.GenerativeModel(MODEL)
-            resp = model.generate_content(prompt)
-            # data = resp
-            data = parse_gemini_response(resp)
-            print(data['summary'])
-            if data:
-                return {
-                    "score": data['score'],
-                    "summary": data['summary'],
-                    "positives": data['positives'],
-                    "improvements": data['improvements'],
-                    "detailed_evaluation": data['detailed_evaluation'],
-                    "feedback": data['feedback']
-                }
-        except Exception as e:
-            print("Gemini API error:", e)
 
-    # Fallback heuristic if AI unavailable or parse failed
+def evaluation_from_data(data: dict) -> dict:
+    return {
+        "score": data['score'],
+        "summary": data['summary'],
+        "positives": data['positives'],
+        "improvements": data['improvements'],
+        "preparation_needed": data['preparation_needed'],
+        "detailed_evaluation": data['detailed_evaluation'],
+        "feedback": data['feedback']
+    }
+
+
+def fallback_answer_evaluation(answer: str) -> dict:
+    """
+    Completeness-only grade, flagged so it is never stored in place of a real one.
+    """
+    answered = bool((answer or "").strip())
+    return {
+        "score": 10 if answered else 0,
+        "feedback": "Basic evaluation: answer measured by completeness only (AI disabled or unavailable).",
+        "fallback": True,
+    }
+
+
+def fallback_evaluation(qa_list: list, score: int = None) -> dict:
+    """
+    Heuristic used when AI is unavailable or its response could not be parsed.
+    `score` (the mean of per-answer grades) replaces the completeness score when given.
+    Flagged so it is shown but never stored in place of a real evaluation.
+    """
     answered = sum(1 for qa in qa_list if qa.get("a", "").strip())
     total = len(qa_list) or 1
-    score = round(10 * (answered / total))
+    if score is None:
+        score = round(10 * (answered / total))
     feedback = (
-        "Basic evaluation: answers were measured by completeness only (AI disabled or unavailable). "
+        "Basic evaluation: the overall write-up was unavailable (AI disabled or unavailable). "
         f"Provided answers for {answered} out of {total} questions."
     )
     return {
@@ -153,6 +134,140 @@ def evaluate_interview(resume_text: str, jd_text: str, qa_list: list):
         "positives": [],
         "improvements": [],
         "preparation_needed": [],
-        "detailed_evaluation": ""
+        "detailed_evaluation": "",
+        "fallback": True,
     }
-    
\ No newline at end of file
+
+
+def _scan_value(text: str, start: int):
+    """
+    Returns the end index of the complete JSON value starting at text[start], or -1 if it is still incomplete.
+    """
+    opener = text[start]
+    if opener == '"':
+        i = start + 1
+        while i < len(text):
+            if text[i] == "\\":
+                i += 2
+                continue
+            if text[i] == '"':
+                return i + 1
+            i += 1
+        return -1
+    if opener in "[{":
+        depth, in_str, i = 0, False, start
+        while i < len(text):
+            c = text[i]
+            if in_str:
+                if c == "\\":
+                    i += 1
+                elif c == '"':
+                    in_str = False
+            elif c == '"':
+                in_str = True
+            elif c in "[{":
+                depth += 1
+            elif c in "]}":
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            i += 1
+        return -1
+    # Scalars are complete once a delimiter follows them
+    m = re.compile(r"[^,}\]\s]+(?=[,}\]\s])").match(text, start)
+    return m.end() if m else -1
+
+
+def extract_sections(text: str) -> dict:
+    """
+    Parses whichever evaluation fields are already complete in a partial model response.
+    Used to stream sections to the browser before the whole JSON has arrived.
+    """
+    found = {}
+    for key in EVALUATION_KEYS:
+        m = re.search(r'"%s"\s*:\s*' % key, text)
+        if not m or m.end() >= len(text):
+            continue
+        end = _scan_value(text, m.end())
+        if end == -1:
+            continue
+        try:
+            found[key] = json.loads(text[m.end():end])
+        except ValueError:
+            continue
+    return found
+
+
+async def evaluate_answer(resume_text: str, jd_text: str, question: str, answer: str) -> dict:
+    """
+    {"score": 0-10, "feedback": str} for one answer; a completeness heuristic without AI.
+    """
+    if not (answer or "").strip():
+        return {"score": 0, "feedback": "No answer was given."}
+    if llm_client.is_available():
+        with stage("prompt_build"):
+            prompt = build_answer_prompt(resume_text, jd_text, question, answer)
+        try:
+            return (await structured_output.generate(prompt, AnswerResult)).model_dump()
+        except Exception as e:
+            logger.warning("Answer evaluation failed, using completeness fallback: %s", e)
+    return fallback_answer_evaluation(answer)
+
+
+async def score_answers(resume_text: str, jd_text: str, qa_list: list, stored: dict = None) -> list:
+    """
+    Per-answer grades for a whole interview: [{"index", "q", "a", "score", "feedback", "save", "fallback"}].
+    Grades already stored for the same question and answer ({index: {...}}, see
+    results.stored_answer_scores) are reused; the rest are graded concurrently, and those
+    worth keeping are marked `save` for the caller to store. An answer whose background
+    grading is still in flight joins that model call through the LLM client's coalescing.
+    """
+    stored = stored or {}
+
+    async def grade(index: int, qa: dict) -> dict:
+        q, a = qa.get("q", ""), qa.get("a", "")
+        known = stored.get(index)
+        if known and known["question"] == q and known["answer"] == a and known["score"] is not None:
+            inc("answer_evaluations_total", "Interview answers graded, by source (stored|fresh)", source="stored")
+            return {"index": index, "q": q, "a": a, "score": known["score"], "feedback": known["feedback"], "save": False}
+        inc("answer_evaluations_total", "Interview answers graded, by source (stored|fresh)", source="fresh")
+        result = await evaluate_answer(resume_text, jd_text, q, a)
+        fallback = bool(result.get("fallback"))
+        return {"index": index, "q": q, "a": a, "score": result["score"], "feedback": result["feedback"],
+                "save": not fallback, "fallback": fallback}
+
+    return list(await asyncio.gather(*(grade(i, qa) for i, qa in enumerate(qa_list))))
+
+
+def overall_score(graded: list) -> int:
+    return round(sum(g["score"] or 0 for g in graded) / len(graded)) if graded else 0
+
+
+def flag_fallback(result: dict, graded: list) -> dict:
+    """
+    Marks an evaluation as a fallback when any of its grades is one, since the overall
+    score is their mean.
+    """
+    if any(g.get("fallback") for g in graded):
+        result["fallback"] = True
+    return result
+
+
+async def summarize_interview(resume_text: str, jd_text: str, graded: list) -> dict:
+    """
+    The final evaluation: one small model call over the per-answer grades. The overall
+    score is always the mean of the grades, so fallback grades make it a fallback too.
+    """
+    qa_list = [{"q": g["q"], "a": g["a"]} for g in graded]
+    score = overall_score(graded)
+    if llm_client.is_available():
+        with stage("prompt_build"):
+            prompt = build_summary_prompt(resume_text, jd_text, graded, score)
+        try:
+            data = await structured_output.generate(prompt, EvaluationResult)
+            return flag_fallback(dict(evaluation_from_data(data.model_dump()), score=score), graded)
+        except Exception as e:
+            logger.warning("Interview summary failed, using fallback evaluation: %s", e)
+
+    # Fallback heuristic if AI unavailable or parse failed
+    return fallback_evaluation(qa_list, score)
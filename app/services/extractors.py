@@ -0,0 +1,213 @@
+# app/services/extractors.py
+"""
+One extraction pipeline for every document type we accept.
+
+The format is sniffed from magic bytes (never the filename) and routed to
+that format's available backends in order, falling through to the next one
+when a backend fails. The page texts are normalized into one canonical
+string with page offsets and section hints. Every route and cache sees
+exactly the same representation of a given document.
+
+Backends:
+    pdf   PyPDF2 or pypdf (order from PDF_BACKENDS), run on the pdf_engine process pool
+    docx  stdlib zipfile + ElementTree
+    txt   UTF-8 / UTF-16 plain text
+"""
+import importlib.util
+import io
+import logging
+import os
+import re
+import unicodedata
+import zipfile
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from app.services.pdf_engine import PDF_MAX_CHARS, PartialExtraction, extract_pdf
+
+logger = logging.getLogger(__name__)
+
+# Bump when normalization changes so cached extractions are redone
+EXTRACTOR_VERSION = 2
+
+PDF_BACKENDS = [b.strip() for b in os.getenv("PDF_BACKENDS", "PyPDF2,pypdf").split(",") if b.strip()]
+
+SECTION_HEADINGS = (
+    "summary", "profile", "objective", "about", "experience", "work experience",
+    "professional experience", "employment", "projects", "education", "skills",
+    "technical skills", "certifications", "achievements", "awards", "publications",
+    "responsibilities", "requirements", "qualifications", "preferred qualifications",
+    "what you will do", "what we offer", "benefits",
+)
+# A known heading alone on its line, optionally qualified ("Skills Summary", "Education:")
+_HEADING_RE = re.compile(
+    r"^[ \t]*(%s)(?:[ \t]+[\w&/]+){0,2}[ \t]*:?[ \t]*$"
+    % "|".join(re.escape(h) for h in sorted(SECTION_HEADINGS, key=len, reverse=True)),
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+@dataclass
+class ExtractedDocument:
+    text: str
+    page_count: int = 0
+    # Character offset in `text` where each page starts
+    page_offsets: List[int] = field(default_factory=list)
+    # [{"title": "experience", "offset": 123}, ...] in document order
+    sections: List[dict] = field(default_factory=list)
+    format: str = "unknown"
+    backend: str = ""
+    # False when extraction hit its deadline; such text must not be cached
+    complete: bool = True
+
+
+@dataclass
+class Backend:
+    name: str
+    format: str
+    # data -> (page texts, page count)
+    extract: Callable[[bytes], Tuple[List[str], int]]
+    available: Callable[[], bool] = lambda: True
+
+
+_BACKENDS: Dict[str, List[Backend]] = {}
+
+
+def register_backend(backend: Backend):
+    _BACKENDS.setdefault(backend.format, []).append(backend)
+
+
+def sniff_format(data: bytes) -> str:
+    head = data[:1024]
+    if b"%PDF-" in head:
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as z:
+                if "word/document.xml" in z.namelist():
+                    return "docx"
+        except zipfile.BadZipFile:
+            pass
+        return "unknown"
+    if _decode_text(head) is not None:
+        return "txt"
+    return "unknown"
+
+
+def _decode_text(data: bytes) -> Optional[str]:
+    if data.startswith((b"\xff\xfe", b"\xfe\xff")):
+        encodings = ("utf-16",)
+    else:
+        encodings = ("utf-8-sig",)
+    for encoding in encodings:
+        try:
+            text = data.decode(encoding)
+        except UnicodeDecodeError:
+            # A multi-byte character may be cut at the sniffing boundary
+            try:
+                text = data[:-3].decode(encoding)
+            except UnicodeDecodeError:
+                continue
+        printable = sum(1 for c in text if c.isprintable() or c in "\n\r\t")
+        if not text or printable / len(text) > 0.95:
+            return text
+    return None
+
+
+def _pdf_backend(library: str) -> Backend:
+    return Backend(
+        name=library,
+        format="pdf",
+        extract=lambda data: extract_pdf(data, library=library),
+        available=lambda: importlib.util.find_spec(library) is not None,
+    )
+
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _extract_docx(data: bytes) -> Tuple[List[str], int]:
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        root = ElementTree.fromstring(z.read("word/document.xml"))
+    paragraphs = []
+    for para in root.iter(f"{_W_NS}p"):
+        paragraphs.append("".join(node.text or "" for node in para.iter(f"{_W_NS}t")))
+    # DOCX has no fixed pagination; treat the body as a single page
+    return ["\n".join(paragraphs)[:PDF_MAX_CHARS]], 1
+
+
+def _extract_txt(data: bytes) -> Tuple[List[str], int]:
+    text = _decode_text(data)
+    if text is None:
+        raise ValueError("Not a text document")
+    return [text[:PDF_MAX_CHARS]], 1
+
+
+for _library in PDF_BACKENDS:
+    register_backend(_pdf_backend(_library))
+register_backend(Backend(name="docx-xml", format="docx", extract=_extract_docx))
+register_backend(Backend(name="plain-text", format="txt", extract=_extract_txt))
+
+
+def normalize_page(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("­", "")
+    # Re-join words hyphenated across line breaks
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+    text = re.sub(r"[ \t\f\v]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def find_sections(text: str) -> List[dict]:
+    return [{"title": m.group(1).lower(), "offset": m.start(1)} for m in _HEADING_RE.finditer(text)]
+
+
+def extract_document(data: bytes) -> ExtractedDocument:
+    """
+    Sniffs, extracts and normalizes a document, trying the format's backends in order until
+    one succeeds. Raises ValueError for unsupported formats; if every backend fails to parse
+    it, the last backend's error is raised. A deadline miss is not retried on another backend:
+    TimeoutError is raised if no text arrived in time, and text cut short by the deadline
+    comes back with complete=False.
+    """
+    fmt = sniff_format(data)
+    backends = [b for b in _BACKENDS.get(fmt, []) if b.available()]
+    if not backends:
+        raise ValueError(f"Unsupported document format: {fmt}")
+
+    complete = True
+    for backend in backends:
+        try:
+            pages, page_count = backend.extract(data)
+            break
+        except PartialExtraction as e:
+            pages, page_count, complete = e.pages, e.page_count, False
+            break
+        except TimeoutError:
+            # The document itself is too slow; another backend would only burn a second deadline
+            raise
+        except Exception as e:
+            logger.warning("%s extraction with %s failed: %s", fmt, backend.name, e)
+            if backend is backends[-1]:
+                raise
+
+    parts, offsets, offset = [], [], 0
+    for page in pages:
+        page = normalize_page(page)
+        offsets.append(offset)
+        parts.append(page)
+        offset += len(page) + 2
+    text = "\n\n".join(parts)
+
+    return ExtractedDocument(
+        text=text,
+        page_count=page_count,
+        page_offsets=offsets,
+        sections=find_sections(text),
+        format=fmt,
+        backend=backend.name,
+        complete=complete,
+    )
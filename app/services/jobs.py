@@ -0,0 +1,265 @@
+# app/services/jobs.py
+"""
+Small SQLite-backed job queue for slow model work.
+
+Jobs live in the `jobs` table; a pool of worker threads claims queued jobs,
+runs the registered handler and records the result. Failed attempts are
+re-queued with exponential backoff until max_attempts is reached.
+
+The pool runs inside the web process by default (JOB_WORKERS threads). Set
+JOB_WORKERS=0 on web processes and run `python -m app.services.jobs` to size
+workers independently.
+"""
+import asyncio
+import inspect
+import json
+import os
+import random
+import threading
+import traceback
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal, Job
+from app.services import metrics
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "600"))
+
+ACTIVE_STATES = ("queued", "running")
+
+HANDLERS: Dict[str, Callable] = {}
+
+# Id of the job the current handler is running for (see save_progress)
+current_job_id: ContextVar[Optional[int]] = ContextVar("current_job_id", default=None)
+
+_wakeup = threading.Event()
+_stop = threading.Event()
+_threads = []
+
+
+def handler(kind: str):
+    """
+    Registers `fn(upload_id, payload) -> dict` (sync or async) for a job kind.
+    """
+    def decorator(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+def enqueue(db: Session, kind: str, upload_id: Optional[int] = None, payload: Optional[dict] = None) -> Job:
+    """
+    Queues a job, or returns the queued/running job of the same kind for this upload.
+    Jobs carrying a payload are never coalesced.
+    """
+    if payload is None and upload_id is not None:
+        existing = (
+            db.query(Job)
+            .filter(Job.kind == kind, Job.upload_id == upload_id, Job.status.in_(ACTIVE_STATES))
+            .order_by(Job.id.desc())
+            .first()
+        )
+        if existing:
+            return existing
+
+    job = Job(
+        kind=kind,
+        upload_id=upload_id,
+        payload=json.dumps(payload, ensure_ascii=False) if payload is not None else None,
+        max_attempts=JOB_MAX_ATTEMPTS,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _wakeup.set()
+    return job
+
+
+def active_job(db: Session, upload_id: int, kinds: Iterable[str]) -> Optional[Job]:
+    """
+    The newest queued/running job of any of the given kinds for an upload.
+    """
+    return (
+        db.query(Job)
+        .filter(Job.upload_id == upload_id, Job.kind.in_(list(kinds)), Job.status.in_(ACTIVE_STATES))
+        .order_by(Job.id.desc())
+        .first()
+    )
+
+
+def latest_job(db: Session, upload_id: int, kinds: Iterable[str], statuses: Iterable[str]) -> Optional[Job]:
+    """
+    The newest job of any of the given kinds and statuses for an upload.
+    """
+    return (
+        db.query(Job)
+        .filter(Job.upload_id == upload_id, Job.kind.in_(list(kinds)), Job.status.in_(list(statuses)))
+        .order_by(Job.id.desc())
+        .first()
+    )
+
+
+def save_progress(partial: dict):
+    """
+    Publishes a partial result for the running job, so pollers of /jobs/{id} can act on
+    finished steps before the whole job is done. No-op outside a job handler.
+    """
+    job_id = current_job_id.get()
+    if job_id is None:
+        return
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "running")
+            .values(result=json.dumps(partial, ensure_ascii=False), updated_at=datetime.utcnow())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def job_status(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "upload_id": job.upload_id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "error": job.error if job.status == "failed" else None,
+        "result": json.loads(job.result) if job.result else None,
+    }
+
+
+def _claim_next(db: Session) -> Optional[Job]:
+    now = datetime.utcnow()
+    candidates = (
+        db.query(Job.id)
+        .filter(Job.status == "queued", Job.run_after <= now)
+        .order_by(Job.id)
+        .limit(5)
+        .all()
+    )
+    for (job_id,) in candidates:
+        # Conditional update so two workers never run the same job
+        claimed = db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "queued")
+            .values(status="running", attempts=Job.attempts + 1, updated_at=now)
+        )
+        db.commit()
+        if claimed.rowcount == 1:
+            return db.get(Job, job_id)
+    return None
+
+
+def _run_handler(job: Job):
+    fn = HANDLERS.get(job.kind)
+    if fn is None:
+        raise RuntimeError(f"No handler registered for job kind '{job.kind}'")
+    payload = json.loads(job.payload) if job.payload else {}
+    metrics.current_route.set(f"job:{job.kind}")
+    metrics.current_upload_id.set(job.upload_id)
+    current_job_id.set(job.id)
+    if inspect.iscoroutinefunction(fn):
+        return asyncio.run(fn(job.upload_id, payload))
+    return fn(job.upload_id, payload)
+
+
+def run_one(db: Session) -> bool:
+    """
+    Claims and executes a single job. Returns False when nothing was runnable.
+    """
+    job = _claim_next(db)
+    if job is None:
+        return False
+
+    try:
+        result = _run_handler(job)
+    except Exception as e:
+        job.error = f"{e}\n{traceback.format_exc(limit=5)}"
+        if job.attempts < job.max_attempts:
+            delay = JOB_RETRY_BASE_SECONDS * (2 ** (job.attempts - 1))
+            job.status = "queued"
+            job.run_after = datetime.utcnow() + timedelta(seconds=delay + random.uniform(0, delay / 2))
+        else:
+            job.status = "failed"
+    else:
+        job.status = "done"
+        job.error = None
+        job.result = json.dumps(result, ensure_ascii=False) if result is not None else None
+    db.commit()
+    return True
+
+
+def _worker_loop():
+    while not _stop.is_set():
+        db = SessionLocal()
+        try:
+            ran = run_one(db)
+        except Exception:
+            traceback.print_exc()
+            ran = False
+        finally:
+            db.close()
+        if not ran:
+            _wakeup.wait(JOB_POLL_SECONDS)
+            _wakeup.clear()
+
+
+def requeue_interrupted():
+    """
+    Jobs left 'running' for longer than JOB_STALE_SECONDS (their worker died) are put back on the queue.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Job)
+            .where(Job.status == "running", Job.updated_at < cutoff)
+            .values(status="queued")
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def start_workers(count: int = JOB_WORKERS):
+    import app.services.tasks  # noqa: F401  (registers handlers)
+
+    if count <= 0 or _threads:
+        return
+    _stop.clear()
+    requeue_interrupted()
+    for i in range(count):
+        t = threading.Thread(target=_worker_loop, name=f"job-worker-{i}", daemon=True)
+        t.start()
+        _threads.append(t)
+
+
+def stop_workers(timeout: float = 5.0):
+    _stop.set()
+    _wakeup.set()
+    for t in _threads:
+        t.join(timeout)
+    _threads.clear()
+
+
+if __name__ == "__main__":
+    import time
+
+    start_workers(max(JOB_WORKERS, 1))
+    print(f"Job workers running: {len(_threads)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop_workers()
@@ -0,0 +1,89 @@
+# app/services/llm_cache.py
+"""
+In-process cache of model responses keyed by (model, prompt hash).
+Entries expire after a TTL and are evicted LRU-first past the entry/byte bounds.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+
+def cache_key(model: str, prompt: str) -> str:
+    return model + ":" + hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, ttl: float = LLM_CACHE_TTL_SECONDS, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "prompt_chars_saved": 0,
+        }
+
+    def get(self, key: str, prompt_chars: int = 0) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] < time.monotonic():
+                self._drop(key)
+                item = None
+            if item is None:
+                self.stats["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self.stats["hits"] += 1
+            self.stats["prompt_chars_saved"] += prompt_chars
+            return item[1]
+
+    def put(self, key: str, value: str) -> None:
+        cost = len(value.encode("utf-8"))
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (time.monotonic() + self.ttl, value, cost)
+            self._size += cost
+            while self._items and (len(self._items) > self.max_entries or self._size > self.max_bytes):
+                self._drop(next(iter(self._items)))
+                self.stats["evictions"] += 1
+
+    def record_coalesced(self, prompt_chars: int = 0) -> None:
+        with self._lock:
+            self.stats["coalesced"] += 1
+            self.stats["prompt_chars_saved"] += prompt_chars
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._items)
+            stats["bytes"] = self._size
+        # Every hit or coalesced caller is a paid model call that did not happen
+        stats["calls_saved"] = stats["hits"] + stats["coalesced"]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def _drop(self, key: str) -> None:
+        _, _, cost = self._items.pop(key)
+        self._size -= cost
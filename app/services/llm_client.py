@@ -0,0 +1,241 @@
+# app/services/llm_client.py
+"""
+Shared Gemini client used by every service that talks to the model.
+
+The google-generativeai SDK is blocking, so calls are dispatched to a
+dedicated thread pool whose size is the global concurrency cap. Async
+callers await the result without blocking the event loop; sync callers
+(threadpool routes, workers) wait on the same pool. Every call carries a
+deadline.
+
+Responses are cached by (model, prompt) and identical in-flight prompts are
+coalesced onto a single call (single-flight), so refreshes, double-clicks
+and repeated JDs don't pay for the same generation twice. JSON-mode
+responses are only cached once the caller has validated them (see
+remember), and text responses only if they pass the caller's `validate`
+check, so a malformed reply is never replayed.
+
+Retries, the circuit breaker and the optional fallback model live in
+app/services/resilience.py.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from app.services.llm_cache import LLMCache, cache_key
+from app.services import metrics, resilience
+from app.services.metrics import stage
+
+load_dotenv()
+API_KEY = os.getenv("GEMINI_API_KEY")
+MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash-lite")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+
+_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+_genai = None
+_genai_lock = threading.Lock()
+
+cache = LLMCache()
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _get_genai():
+    """
+    Imports and configures the SDK once. Returns None if it is not installed or no key is set.
+    """
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                if not API_KEY:
+                    return None
+                try:
+                    import google.generativeai as genai
+                except ImportError:
+                    return None
+                genai.configure(api_key=API_KEY)
+                _genai = genai
+    return _genai
+
+
+def is_available() -> bool:
+    return _get_genai() is not None
+
+
+def _generation_config(json_mode: bool) -> Optional[dict]:
+    # JSON mode constrains decoding to valid JSON; shape is validated by app/services/structured_output.py
+    return {"response_mime_type": "application/json"} if json_mode else None
+
+
+def _key(model: str, prompt: str, json_mode: bool) -> str:
+    return cache_key(model + ("/json" if json_mode else ""), prompt)
+
+
+def _call(prompt: str, model: str, timeout: float, json_mode: bool = False) -> str:
+    genai = _get_genai()
+    if genai is None:
+        raise RuntimeError("Gemini is not configured")
+
+    def attempt(name: str, remaining: float) -> str:
+        resp = genai.GenerativeModel(name).generate_content(
+            prompt, generation_config=_generation_config(json_mode), request_options={"timeout": remaining}
+        )
+        return getattr(resp, "text", None) or str(resp)
+
+    return resilience.call(attempt, model, timeout)
+
+
+def _cacheable(text: str, json_mode: bool, validate: Optional[Callable[[str], bool]]) -> bool:
+    return bool(text) and not json_mode and (validate is None or validate(text))
+
+
+def _submit(key: str, prompt: str, model: str, timeout: float, use_cache: bool, json_mode: bool = False,
+            validate: Optional[Callable[[str], bool]] = None) -> Future:
+    """
+    Starts a model call, or joins the identical call already in flight.
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            cache.record_coalesced(len(prompt))
+            return future
+        future = _executor.submit(_call, prompt, model, timeout, json_mode)
+        _inflight[key] = future
+
+    def _done(f: Future):
+        # Cache before leaving the in-flight table so no caller slips between the two
+        if use_cache and not f.cancelled() and f.exception() is None and _cacheable(f.result(), json_mode, validate):
+            cache.put(key, f.result())
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+    future.add_done_callback(_done)
+    return future
+
+
+async def generate(prompt: str, model: Optional[str] = None, timeout: Optional[float] = None,
+                   use_cache: bool = True, json_mode: bool = False,
+                   validate: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    Returns the model's text for prompt without blocking the event loop.
+    Raises TimeoutError once the deadline (queueing included) passes.
+    json_mode asks the model for a bare JSON response. A text response is cached only
+    if `validate` (when given) accepts it.
+    """
+    model = model or MODEL
+    timeout = timeout or LLM_TIMEOUT_SECONDS
+    key = _key(model, prompt, json_mode)
+    if use_cache:
+        cached = cache.get(key, len(prompt))
+        if cached is not None:
+            return cached
+    resilience.check(model)
+    future = _submit(key, prompt, model, timeout, use_cache, json_mode, validate)
+    with stage("model_call"):
+        # shield: a timed-out caller must not cancel a call other callers may share
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+
+
+def generate_sync(prompt: str, model: Optional[str] = None, timeout: Optional[float] = None,
+                  use_cache: bool = True, json_mode: bool = False,
+                  validate: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    Blocking variant for code already running off the event loop.
+    """
+    model = model or MODEL
+    timeout = timeout or LLM_TIMEOUT_SECONDS
+    key = _key(model, prompt, json_mode)
+    if use_cache:
+        cached = cache.get(key, len(prompt))
+        if cached is not None:
+            return cached
+    resilience.check(model)
+    with stage("model_call"):
+        return _submit(key, prompt, model, timeout, use_cache, json_mode, validate).result(timeout=timeout)
+
+
+def _stream_call(prompt: str, model: str, timeout: float, emit, json_mode: bool = False) -> str:
+    genai = _get_genai()
+    if genai is None:
+        raise RuntimeError("Gemini is not configured")
+    parts = []
+
+    def attempt(name: str, remaining: float) -> str:
+        resp = genai.GenerativeModel(name).generate_content(
+            prompt, stream=True, generation_config=_generation_config(json_mode),
+            request_options={"timeout": remaining},
+        )
+        for chunk in resp:
+            text = getattr(chunk, "text", None) or ""
+            if text:
+                parts.append(text)
+                emit(text)
+        return "".join(parts)
+
+    # Once a chunk has reached the client a retry would duplicate it, so only retry before that
+    return resilience.call(attempt, model, timeout, can_retry=lambda: not parts)
+
+
+async def stream(prompt: str, model: Optional[str] = None, timeout: Optional[float] = None,
+                 use_cache: bool = True, json_mode: bool = False,
+                 validate: Optional[Callable[[str], bool]] = None) -> AsyncIterator[str]:
+    """
+    Yields text chunks as the model produces them. A cached response is yielded whole; the
+    full response is cached as for generate.
+    The streaming call holds one executor slot, so it counts against the concurrency cap.
+    """
+    model = model or MODEL
+    timeout = timeout or LLM_TIMEOUT_SECONDS
+    key = _key(model, prompt, json_mode)
+    if use_cache:
+        cached = cache.get(key, len(prompt))
+        if cached is not None:
+            yield cached
+            return
+
+    resilience.check(model)
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def emit(text: str):
+        loop.call_soon_threadsafe(queue.put_nowait, text)
+
+    future = _executor.submit(_stream_call, prompt, model, timeout, emit, json_mode)
+    future.add_done_callback(lambda f: loop.call_soon_threadsafe(queue.put_nowait, done))
+
+    deadline = loop.time() + timeout
+    started = loop.time()
+    try:
+        while True:
+            item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+            if item is done:
+                break
+            yield item
+    finally:
+        metrics.observe("model_call", (loop.time() - started) * 1000)
+
+    full = future.result()
+    if use_cache and _cacheable(full, json_mode, validate):
+        cache.put(key, full)
+
+
+def remember(prompt: str, text: str, model: Optional[str] = None, json_mode: bool = False):
+    """
+    Caches a response the caller has validated; JSON-mode responses are not cached on arrival.
+    """
+    if text:
+        cache.put(_key(model or MODEL, prompt, json_mode), text)
+
+
+def cache_stats() -> dict:
+    stats = cache.snapshot()
+    stats["in_flight"] = len(_inflight)
+    stats["breakers_open"] = resilience.open_breakers()
+    return stats
@@ -0,0 +1,219 @@
+# app/services/metrics.py
+"""
+Hot-path timing and counters, exported in Prometheus text format at /metrics.
+
+Code wraps a stage with `with stage("model_call"): ...`. Samples are tagged
+with the current route (set by TimingMiddleware, or "job:<kind>" in workers)
+and collected per request, so a Server-Timing header and an optional log line
+can show which stage dominated. upload_id is kept on the per-request record
+only; it is not a Prometheus label, to keep series cardinality bounded.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from fastapi.templating import Jinja2Templates
+from starlette.routing import Match
+
+METRICS_TIMING_HEADER = os.getenv("METRICS_TIMING_HEADER", "0") == "1"
+METRICS_LOG_REQUESTS = os.getenv("METRICS_LOG_REQUESTS", "0") == "1"
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+logger = logging.getLogger("app.timing")
+
+current_route: ContextVar[str] = ContextVar("current_route", default="background")
+current_upload_id: ContextVar[Optional[int]] = ContextVar("current_upload_id", default=None)
+_request_stages: ContextVar[Optional[list]] = ContextVar("request_stages", default=None)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "count", "sum_ms")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, ms: float):
+        self.count += 1
+        self.sum_ms += ms
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+
+
+_lock = threading.Lock()
+_stage_hist: Dict[Tuple[str, str], _Histogram] = {}
+_request_hist: Dict[Tuple[str, str], _Histogram] = {}
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+_counter_help: Dict[str, str] = {}
+
+
+def bind(route: Optional[str] = None, upload_id: Optional[int] = None):
+    """
+    Tags samples recorded in the current context (request, job or task).
+    """
+    if route is not None:
+        current_route.set(route)
+    if upload_id is not None:
+        current_upload_id.set(upload_id)
+
+
+def observe(stage_name: str, ms: float):
+    route = current_route.get()
+    with _lock:
+        hist = _stage_hist.get((stage_name, route))
+        if hist is None:
+            hist = _stage_hist[(stage_name, route)] = _Histogram()
+        hist.observe(ms)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages.append((stage_name, ms))
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - started) * 1000)
+
+
+def inc(name: str, help_text: str = "", value: float = 1.0, **labels):
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+        if help_text:
+            _counter_help.setdefault(name, help_text)
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in labels.items())
+
+
+def _render_histogram(lines: list, name: str, help_text: str, series: dict, label_names: Tuple[str, str]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, hist in sorted(series.items()):
+        base = dict(zip(label_names, key))
+        cumulative = 0
+        for bound, n in zip(BUCKETS_MS, hist.buckets):
+            cumulative += n
+            lines.append(f"{name}_bucket{{{_labels(**base, le=bound / 1000)}}} {cumulative}")
+        lines.append(f"{name}_bucket{{{_labels(**base, le='+Inf')}}} {hist.count}")
+        lines.append(f"{name}_sum{{{_labels(**base)}}} {hist.sum_ms / 1000:.6f}")
+        lines.append(f"{name}_count{{{_labels(**base)}}} {hist.count}")
+
+
+def render_prometheus(extra_gauges: Optional[Dict[str, float]] = None) -> str:
+    lines = []
+    with _lock:
+        _render_histogram(lines, "interview_stage_duration_seconds", "Time spent per hot-path stage.",
+                          _stage_hist, ("stage", "route"))
+        _render_histogram(lines, "interview_request_duration_seconds", "End-to-end request time.",
+                          _request_hist, ("route", "method"))
+        seen = set()
+        for (name, labels), value in sorted(_counters.items()):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {_counter_help.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+            label_str = _labels(**dict(labels))
+            lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+    for name, value in (extra_gauges or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _route_template(app, scope) -> Tuple[str, Optional[int]]:
+    for route in app.router.routes:
+        match, child = route.matches(scope)
+        if match == Match.FULL:
+            upload_id = child.get("path_params", {}).get("upload_id")
+            return getattr(route, "path", scope["path"]), upload_id
+    return "unmatched", None
+
+
+class TimingMiddleware:
+    """
+    Pure ASGI middleware (streaming-safe) that records request time per route template,
+    binds route/upload_id for stage samples and optionally adds a Server-Timing header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        route, upload_id = _route_template(scope["app"], scope)
+        current_route.set(route)
+        current_upload_id.set(upload_id)
+        stages = []
+        _request_stages.set(stages)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and METRICS_TIMING_HEADER:
+                total = (time.perf_counter() - started) * 1000
+                parts = [f"{name};dur={ms:.1f}" for name, ms in stages] + [f"app;dur={total:.1f}"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(parts).encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            total = (time.perf_counter() - started) * 1000
+            with _lock:
+                hist = _request_hist.get((route, scope["method"]))
+                if hist is None:
+                    hist = _request_hist[(route, scope["method"])] = _Histogram()
+                hist.observe(total)
+            if METRICS_LOG_REQUESTS:
+                logger.info(json.dumps({
+                    "route": route,
+                    "method": scope["method"],
+                    "upload_id": current_upload_id.get(),
+                    "total_ms": round(total, 2),
+                    "stages": [{"stage": n, "ms": round(ms, 2)} for n, ms in stages],
+                }))
+
+
+class TimedJinja2Templates(Jinja2Templates):
+    """
+    Jinja2Templates whose TemplateResponse (which renders eagerly) is timed as "template_render".
+    """
+
+    def TemplateResponse(self, *args, **kwargs):
+        with stage("template_render"):
+            return super().TemplateResponse(*args, **kwargs)
+
+
+def instrument_sessions():
+    """
+    Times every ORM commit as "db_commit" (covers sync and async sessions).
+    """
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    @event.listens_for(Session, "before_commit")
+    def _before_commit(session):
+        session.info["commit_started"] = time.perf_counter()
+
+    @event.listens_for(Session, "after_commit")
+    def _after_commit(session):
+        started = session.info.pop("commit_started", None)
+        if started is not None:
+            observe("db_commit", (time.perf_counter() - started) * 1000)
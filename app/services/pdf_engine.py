@@ -0,0 +1,217 @@
+# app/services/pdf_engine.py
+"""
+PDF text extraction fanned out over a process pool.
+
+Pages are extracted in batches by worker processes (PyPDF2 is pure Python, so
+threads would serialize on the GIL). Extraction is capped by page count and
+characters -- prompts only use the first few thousand characters -- and stops
+scheduling batches once enough text is gathered.
+
+Each worker is a long-lived process on its own pipe, so a batch that overruns
+the deadline costs only the worker running it: that process is killed and
+replaced on next use while other documents keep extracting. A document that
+exceeds the deadline raises PartialExtraction with whatever text was
+extracted so far; callers must not cache it as the document's text.
+
+This module is imported by worker processes, so it must stay free of app imports.
+"""
+import importlib
+import io
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Optional, Tuple
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "20"))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "12000"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "4"))
+PDF_EXTRACT_TIMEOUT = float(os.getenv("PDF_EXTRACT_TIMEOUT", "10"))
+PDF_MP_START = os.getenv("PDF_MP_START", "spawn")
+
+_pool: Optional["_WorkerPool"] = None
+_pool_lock = threading.Lock()
+
+
+class PartialExtraction(TimeoutError):
+    """
+    The deadline passed mid-document. `pages` and `page_count` hold what was extracted.
+    """
+
+    def __init__(self, pages: List[str], page_count: int):
+        super().__init__("PDF extraction timed out")
+        self.pages = pages
+        self.page_count = page_count
+
+
+def extract_pages(data: bytes, start: int, end: int, library: str = "PyPDF2") -> Tuple[int, List[str]]:
+    """
+    Returns (total page count, texts of pages [start, end)) using PyPDF2 or pypdf.
+    Runs inside a worker process.
+    """
+    module = importlib.import_module(library)
+    reader = module.PdfReader(io.BytesIO(data))
+    pages = reader.pages
+    return len(pages), [(pages[i].extract_text() or "") for i in range(start, min(end, len(pages)))]
+
+
+def _serve(conn):
+    """
+    Worker process loop: runs (fn, args) requests from the pipe and sends back (ok, value).
+    """
+    while True:
+        try:
+            fn, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send((True, fn(*args)))
+        except Exception as e:
+            conn.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def run(self, fn, args, timeout: float):
+        self.conn.send((fn, args))
+        if not self.conn.poll(max(timeout, 0)):
+            raise FutureTimeout()
+        ok, value = self.conn.recv()
+        if not ok:
+            raise value
+        return value
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+class _WorkerPool:
+    """
+    Fixed number of worker slots. A slot holds a live _Worker or None (started on next use).
+    """
+
+    def __init__(self, size: int):
+        self._ctx = multiprocessing.get_context(PDF_MP_START)
+        self._slots: "queue.Queue[Optional[_Worker]]" = queue.Queue()
+        for _ in range(size):
+            self._slots.put(None)
+        # Threads only wait on pipes; the work happens in the processes
+        self._dispatch = ThreadPoolExecutor(max_workers=size * 4, thread_name_prefix="pdf")
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+
+    def call(self, fn, args, deadline: float):
+        try:
+            worker = self._slots.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+            raise FutureTimeout() from None
+        if worker is None:
+            worker = _Worker(self._ctx)
+            with self._lock:
+                self._workers.append(worker)
+        try:
+            result = worker.run(fn, args, deadline - time.monotonic())
+        except (FutureTimeout, EOFError, OSError):
+            # Stuck or dead: replace only this worker
+            worker.kill()
+            with self._lock:
+                self._workers.remove(worker)
+            self._slots.put(None)
+            raise
+        except BaseException:
+            self._slots.put(worker)
+            raise
+        self._slots.put(worker)
+        return result
+
+    def submit(self, fn, args, deadline: float) -> Future:
+        return self._dispatch.submit(self.call, fn, args, deadline)
+
+    def shutdown(self):
+        self._dispatch.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.kill()
+
+
+def _get_pool() -> Optional[_WorkerPool]:
+    global _pool
+    if PDF_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = _WorkerPool(PDF_WORKERS)
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def extract_pdf(data: bytes, library: str = "PyPDF2", max_pages: int = PDF_MAX_PAGES,
+                max_chars: int = PDF_MAX_CHARS, timeout: float = PDF_EXTRACT_TIMEOUT) -> Tuple[List[str], int]:
+    """
+    Returns (page texts, page_count), stopping once about max_chars have been gathered.
+    Raises if the document cannot be parsed at all, TimeoutError if not even the first
+    pages arrive in time, and PartialExtraction if the deadline passes after that.
+    """
+    pool = _get_pool()
+    if pool is None:
+        page_count, texts = extract_pages(data, 0, max_pages, library)
+        return _cap(texts, page_count, max_chars)
+
+    deadline = time.monotonic() + timeout
+    step = max(PDF_PAGES_PER_TASK, 1)
+    try:
+        page_count, texts = pool.call(extract_pages, (data, 0, min(step, max_pages), library), deadline)
+    except FutureTimeout:
+        raise TimeoutError("PDF extraction timed out") from None
+
+    limit = min(page_count, max_pages)
+    chars = sum(len(t) + 1 for t in texts)
+    start = len(texts)
+    while start < limit and chars < max_chars:
+        # One wave of batches at a time so extraction stops early once enough text is in
+        futures = []
+        for batch_start in range(start, limit, step):
+            if len(futures) == PDF_WORKERS:
+                break
+            args = (data, batch_start, min(batch_start + step, limit), library)
+            futures.append(pool.submit(extract_pages, args, deadline))
+        for future in futures:
+            try:
+                _, batch = future.result()
+            except FutureTimeout:
+                for pending in futures:
+                    pending.cancel()
+                raise PartialExtraction(*_cap(texts, page_count, max_chars)) from None
+            texts.extend(batch)
+            chars += sum(len(t) + 1 for t in batch)
+        start += step * len(futures)
+
+    return _cap(texts, page_count, max_chars)
+
+
+def _cap(texts: List[str], page_count: int, max_chars: int) -> Tuple[List[str], int]:
+    kept, total = [], 0
+    for text in texts:
+        if total >= max_chars:
+            break
+        kept.append(text[:max_chars - total])
+        total += len(kept[-1])
+    return kept, page_count
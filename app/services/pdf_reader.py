@@ -1,11 +0,0 @@
-from PyPDF2 import PdfReader
-
-def extract_text(pdf_path: str) -> str:
-    try:
-        reader = PdfReader(pdf_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text.strip()
-    except Exception:
-        return ""
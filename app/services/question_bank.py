@@ -0,0 +1,287 @@
+# app/services/question_bank.py
+"""
+Persistent interview question bank with local retrieval.
+
+Questions from past generations (keyed by JD text hash and tagged with the
+skills they cover) and a seed set live in the `question_bank` table. An
+in-process inverted index (skill term -> question ids, JD key -> question
+ids) picks questions for a new candidate in milliseconds; the model is only
+asked for the part of the interview the bank cannot cover.
+
+QUESTION_BANK_AI_RATIO sets the share of each interview that is freshly
+generated: 0 serves entirely from the bank when it has enough matches, 1
+always generates (the bank is then only a fallback).
+"""
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from app.db import SessionLocal, BankQuestion
+from app.services.context_selector import tokenize
+from app.services.metrics import inc
+from app.services.question_generator import ai_enabled, generate_ai_questions, _fallback_questions
+
+logger = logging.getLogger(__name__)
+
+QUESTION_BANK_AI_RATIO = float(os.getenv("QUESTION_BANK_AI_RATIO", "0.4"))
+QUESTION_BANK_MIN_SCORE = float(os.getenv("QUESTION_BANK_MIN_SCORE", "2.0"))
+QUESTION_BANK_REFRESH_SECONDS = float(os.getenv("QUESTION_BANK_REFRESH_SECONDS", "30"))
+
+JD_MATCH_BONUS = 4.0  # asked before for this exact JD; ranks, never qualifies a question on its own
+SHARED_TERM_WEIGHT = 2.0  # in both resume and JD: the candidate's relevant skills
+JD_TERM_WEIGHT = 1.0
+RESUME_TERM_WEIGHT = 0.5
+
+SEED_QUESTIONS: Dict[str, List[str]] = {
+    "python": [
+        "How do Python generators differ from lists, and when would you choose one over the other?",
+        "Explain the GIL and how it affects CPU-bound versus I/O-bound Python code.",
+    ],
+    "java": ["How does garbage collection work in the JVM, and how would you diagnose a memory leak?"],
+    "javascript": ["Explain the JavaScript event loop and how promises and async/await fit into it."],
+    "react": ["How do you prevent unnecessary re-renders in a React application?"],
+    "sql": [
+        "How would you find and fix a slow SQL query?",
+        "Explain the differences between INNER, LEFT and FULL OUTER joins with an example.",
+    ],
+    "api": ["How would you design and version a REST API that external clients depend on?"],
+    "docker": ["What makes a Docker image small and fast to build, and how do you achieve it?"],
+    "kubernetes": ["How do readiness and liveness probes differ in Kubernetes, and what happens when each fails?"],
+    "aws": ["How would you design a highly available web service on AWS, and what would it cost to run?"],
+    "machine learning": [
+        "How do you detect and handle overfitting in a machine learning model?",
+        "How would you evaluate a classifier on a heavily imbalanced dataset?",
+    ],
+    "data": ["Describe how you would build a reliable pipeline that ingests and cleans data daily."],
+    "testing": ["How do you decide what to cover with unit tests versus integration tests?"],
+    "git": ["Walk me through how you would resolve a difficult merge conflict in a shared branch."],
+    "system design": ["Design a URL shortener. How does it scale to millions of requests per day?"],
+    "algorithms": ["[CODING] Given an array of integers, return the indices of two numbers that add up to a target."],
+    "leadership": ["Tell me about a time you had to lead a team through a disagreement about technical direction."],
+    "communication": ["How do you explain a complex technical trade-off to a non-technical stakeholder?"],
+}
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(re.sub(r"\s+", " ", text.strip().lower()).encode("utf-8")).hexdigest()
+
+
+def jd_key(jd_text: str) -> str:
+    return text_hash(jd_text or "")
+
+
+class _Index:
+    def __init__(self):
+        self.texts: Dict[int, str] = {}
+        self.hashes: Set[str] = set()
+        self.postings: Dict[str, Set[int]] = {}
+        self.by_jd: Dict[str, List[int]] = {}
+        # Highest id read from the table; ids this process adds itself do not move it,
+        # since other workers may have inserted lower ids that are not loaded yet
+        self.loaded_id = 0
+        self.loaded_at = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, qid: int, text: str, h: str, key: Optional[str], tags: Iterable[str]):
+        self.texts[qid] = text
+        self.hashes.add(h)
+        for tag in tags:
+            self.postings.setdefault(tag, set()).add(qid)
+        if key:
+            self.by_jd.setdefault(key, []).append(qid)
+
+
+_index = _Index()
+
+
+def _refresh(force: bool = False):
+    """
+    Pulls rows added since the last load (by this or another process) into the index.
+    """
+    if not force and time.monotonic() - _index.loaded_at < QUESTION_BANK_REFRESH_SECONDS:
+        return
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(BankQuestion.id, BankQuestion.text, BankQuestion.text_hash, BankQuestion.jd_key, BankQuestion.tags)
+            .filter(BankQuestion.id > _index.loaded_id)
+            .order_by(BankQuestion.id)
+            .all()
+        )
+    finally:
+        db.close()
+    with _index.lock:
+        for qid, text, h, key, tags in rows:
+            if qid not in _index.texts:
+                _index.add(qid, text, h, key, (tags or "").split())
+            _index.loaded_id = max(_index.loaded_id, qid)
+        _index.loaded_at = time.monotonic()
+
+
+def _query_weights(resume_text: str, jd_text: str) -> Dict[str, float]:
+    resume_terms = set(tokenize(resume_text))
+    jd_terms = set(tokenize(jd_text))
+    weights = {t: RESUME_TERM_WEIGHT for t in resume_terms}
+    for t in jd_terms:
+        weights[t] = SHARED_TERM_WEIGHT if t in resume_terms else JD_TERM_WEIGHT
+    return weights
+
+
+def retrieve(resume_text: str, jd_text: str, k: int, exclude: Iterable[str] = ()) -> List[str]:
+    """
+    Up to k banked questions for this candidate, best first. Questions are scored by the
+    idf-weighted skill tags they share with the resume/JD; those scoring under
+    QUESTION_BANK_MIN_SCORE are left out. Questions generated for this same JD get a bonus
+    on top, so a question written around another candidate's resume is only reused when it
+    matches this candidate's skills as well.
+    """
+    if k <= 0:
+        return []
+    _refresh()
+    skip = {text_hash(q) for q in exclude}
+    scores: Counter = Counter()
+    with _index.lock:
+        total = len(_index.texts) or 1
+        for term, weight in _query_weights(resume_text, jd_text).items():
+            ids = _index.postings.get(term)
+            if ids:
+                idf = math.log1p(total / len(ids))
+                for qid in ids:
+                    scores[qid] += weight * idf
+        matched = {qid: s for qid, s in scores.items() if s >= QUESTION_BANK_MIN_SCORE}
+        for qid in _index.by_jd.get(jd_key(jd_text), []):
+            if qid in matched:
+                matched[qid] += JD_MATCH_BONUS
+        ranked = [(s, _index.texts[qid]) for qid, s in matched.items()]
+
+    picked = []
+    for _, text in sorted(ranked, key=lambda item: -item[0]):
+        h = text_hash(text)
+        if h not in skip:
+            skip.add(h)
+            picked.append(text)
+            if len(picked) == k:
+                break
+    inc("question_bank_served_total", "Interview questions served from the question bank", len(picked))
+    return picked
+
+
+def _tags_for(question: str, context_terms: Optional[Set[str]] = None) -> List[str]:
+    terms = set(tokenize(question))
+    if context_terms:
+        # Keep the skills the question is about, as far as the resume/JD tell us
+        terms = (terms & context_terms) or terms
+    return sorted(terms)
+
+
+def add_questions(questions: List[str], resume_text: str = "", jd_text: str = "", source: str = "generated",
+                  tags: Optional[List[str]] = None) -> int:
+    """
+    Banks new questions (duplicates are skipped). Returns how many were added.
+    """
+    context_terms = set(tokenize(resume_text)) | set(tokenize(jd_text))
+    key = jd_key(jd_text) if jd_text else None
+    added = 0
+    db = SessionLocal()
+    try:
+        for question in questions:
+            question = question.strip()
+            h = text_hash(question)
+            if not question or h in _index.hashes:
+                continue
+            row = BankQuestion(
+                text=question,
+                text_hash=h,
+                jd_key=key,
+                tags=" ".join(tags if tags is not None else _tags_for(question, context_terms)),
+                source=source,
+            )
+            db.add(row)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Banked concurrently by another worker
+                db.rollback()
+                continue
+            with _index.lock:
+                _index.add(row.id, row.text, h, key, row.tags.split())
+            added += 1
+    finally:
+        db.close()
+    return added
+
+
+def seed_rows() -> List[Tuple[str, str]]:
+    """
+    (question, tags) pairs for the seed set; multi-word skills are tagged by each of their terms.
+    """
+    rows = []
+    for skill, questions in SEED_QUESTIONS.items():
+        for question in questions:
+            rows.append((question, " ".join(sorted(set(tokenize(skill)) | set(tokenize(question))))))
+    return rows
+
+
+def bank_share(n: int) -> int:
+    """
+    How many of n interview questions should come from the bank.
+    """
+    ratio = min(max(QUESTION_BANK_AI_RATIO, 0.0), 1.0)
+    return n - round(n * ratio)
+
+
+def bank_only_set(resume_text: str, jd_text: str, n: int = 5) -> Optional[List[str]]:
+    """
+    A whole interview from the bank, when no generation is wanted (ratio 0, or the model is
+    not configured) and the bank has n good matches. None means the model has a gap to fill.
+    """
+    if ai_enabled() and bank_share(n) < n:
+        return None
+    questions = retrieve(resume_text, jd_text, n)
+    return questions if len(questions) == n else None
+
+
+async def build_question_set(resume_text: str, jd_text: str, n: int = 5) -> List[str]:
+    """
+    Bank questions for the bank's share of the interview, the model for the rest. If the model
+    is unavailable or comes back short, the gap is topped up from the bank, then the default set.
+    """
+    bank = retrieve(resume_text, jd_text, bank_share(n))
+    generated: List[str] = []
+    need = n - len(bank)
+    if need > 0 and ai_enabled():
+        try:
+            generated = await generate_ai_questions(resume_text, jd_text, need, avoid=bank)
+        except Exception as e:
+            logger.warning("Question generation failed, using the question bank: %s", e)
+        if generated:
+            add_questions(generated, resume_text, jd_text)
+
+    questions = mix(generated, bank)[:n]
+    if len(questions) < n:
+        questions += retrieve(resume_text, jd_text, n - len(questions), exclude=questions)
+    if len(questions) < n:
+        seen = {text_hash(q) for q in questions}
+        questions += [q for q in _fallback_questions() if text_hash(q) not in seen][: n - len(questions)]
+    return questions
+
+
+def mix(generated: List[str], bank: List[str]) -> List[str]:
+    """
+    Interleaves candidate-specific and banked questions, starting with a generated one.
+    """
+    out = []
+    for i in range(max(len(generated), len(bank))):
+        if i < len(generated):
+            out.append(generated[i])
+        if i < len(bank):
+            out.append(bank[i])
+    return out
@@ -1,23 +1,14 @@
 # app/services/question_generator.py
-import os, re
-from dotenv import load_dotenv
+from typing import List, Optional
+
+from app.services import llm_client
+from app.services.structured_output import clean_question_line, parse_questions
+from app.services.context_selector import select_context
+from app.services.metrics import stage
 
 # If you want AI questions (Gemini):
 USE_AI = True
 
-try:
-    import google.generativeai as genai
-except Exception:
-    genai = None
-    USE_AI = False
-
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash-lite")
-
-if USE_AI and genai and API_KEY:
-    genai.configure(api_key=API_KEY)
-
 def _fallback_questions():
     return [
         "Walk me through a project from your resume you're most proud of. Why?",
@@ -27,34 +18,47 @@ def _fallback_questions():
         "Implement a function to check if a string is a valid palindrome (ignore non-alphanumerics)."
     ]
 
-def generate_questions(resume_text: str, jd_text: str, n: int = 5):
-    """
-    Returns a list of n questions. Uses Gemini if configured; else falls back to a solid default set.
-    """
-    if USE_AI and genai and API_KEY:
-        prompt = f"""
+def ai_enabled() -> bool:
+    return USE_AI and llm_client.is_available()
+
+def build_question_prompt(resume_text: str, jd_text: str, n: int = 5, avoid: Optional[List[str]] = None) -> str:
+    resume_text, jd_text = select_context(resume_text, jd_text)
+    # Questions already picked from the question bank, so the model fills gaps instead of repeating them
+    avoid_block = ""
+    if avoid:
+        avoid_block = "- Do not repeat or rephrase these questions, which are already in the interview:\n" + \
+            "\n".join(f"      * {q}" for q in avoid) + "\n"
+    return f"""
     You are an expert technical interviewer. Based on the candidate resume and job description below,
     generate {n} concise interview questions tailored to the candidate and role.
     - Mix technical, coding, and behavioral questions.
     - Try to label coding questions by prefixing them with [CODING], but do not require it.
     - Return one question per line, clear and concise.
-    Resume (truncated):
-    {resume_text[:1500]}
+    {avoid_block}
+    Resume (most relevant excerpts):
+    {resume_text}
 
-    Job Description (truncated):
-    {jd_text[:1500]}
+    Job Description (most relevant excerpts):
+    {jd_text}
+    """
+
+async def generate_ai_questions(resume_text: str, jd_text: str, n: int = 5, avoid: Optional[List[str]] = None) -> List[str]:
+    """
+    Model-generated questions only: raises if the model is unavailable, [] if nothing usable came back.
+    A reply with fewer than n usable questions is not cached.
+    """
+    with stage("prompt_build"):
+        prompt = build_question_prompt(resume_text, jd_text, n, avoid)
+    text = await llm_client.generate(prompt, validate=lambda reply: len(parse_questions(reply, n)) == n)
+    return parse_questions(text, n)
+
+async def generate_questions(resume_text: str, jd_text: str, n: int = 5):
+    """
+    Returns a list of n questions. Uses Gemini if configured; else falls back to a solid default set.
     """
-        
+    if ai_enabled():
         try:
-            model = genai.GenerativeModel(MODEL)
-            resp = model.generate_content(prompt)
-            text = getattr(resp, "text", None)
-            if not text:
-                text = str(resp)
-            lines = [re.sub(r'^[\-\d\.\s]+', '', l).strip() for l in text.splitlines() if l.strip()]
-            if not lines:
-                return _fallback_questions()[:n]
-            return lines[:n]
+            return await generate_ai_questions(resume_text, jd_text, n) or _fallback_questions()[:n]
         except Exception:
             return _fallback_questions()[:n]
     else:
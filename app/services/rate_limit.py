@@ -0,0 +1,48 @@
+# app/services/rate_limit.py
+"""
+In-process token-bucket rate limiting.
+
+Each key (client IP, email, ...) gets a bucket of `burst` tokens refilled at
+`rate_per_minute`; a request spends one token and is refused when the bucket
+is empty. A rate of 0 disables the limiter. Buckets live in a bounded LRU so
+a flood of distinct keys cannot grow memory without limit. Limits are per
+process.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from app.services.metrics import inc
+
+
+class TokenBucketLimiter:
+    def __init__(self, name: str, rate_per_minute: float, burst: int, max_keys: int = 100_000):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key: str) -> bool:
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        if not allowed:
+            inc("rate_limited_total", "Requests refused by a rate limiter", limiter=self.name)
+        return allowed
+
+    def retry_after(self) -> int:
+        """
+        Seconds until an empty bucket has a token again.
+        """
+        return max(1, int(1 / self.rate)) if self.rate > 0 else 0
@@ -0,0 +1,159 @@
+# app/services/resilience.py
+"""
+Retries, circuit breaking and model failover for calls to the model backend.
+
+Each attempt runs under the caller's overall deadline. Transient errors
+(timeouts, 429/5xx, connection resets) are retried with full-jitter
+exponential backoff. Every model has a circuit breaker: after
+LLM_BREAKER_FAILURES consecutive transient failures it opens and calls fail
+immediately with CircuitOpenError, so callers drop to their local fallbacks
+in milliseconds. After LLM_BREAKER_RESET_SECONDS a single probe is let
+through (half-open); its outcome closes or re-opens the breaker. If
+GEMINI_FALLBACK_MODEL is set, it is tried whenever the primary model is
+open or has failed.
+"""
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.services.metrics import inc
+
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+FALLBACK_MODEL = os.getenv("GEMINI_FALLBACK_MODEL", "")
+
+# google.api_core exception names, matched by name so the SDK stays an optional import
+_TRANSIENT_NAMES = {
+    "DeadlineExceeded", "ServiceUnavailable", "InternalServerError", "ResourceExhausted",
+    "TooManyRequests", "BadGateway", "GatewayTimeout", "RetryError",
+}
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return type(exc).__name__ in _TRANSIENT_NAMES
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failures: int = LLM_BREAKER_FAILURES, reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        self.name = name
+        self.max_failures = failures
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def rejects(self) -> bool:
+        """
+        True while calls would be refused; does not claim the half-open probe.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at < self.reset_seconds
+            return self.state == self.HALF_OPEN
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN  # this caller is the probe
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.max_failures:
+                if self.state != self.OPEN:
+                    inc("llm_breaker_trips_total", "Times a model circuit breaker opened", model=self.name)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(model: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(model)
+        return _breakers[model]
+
+
+def models_for(model: str) -> List[str]:
+    return [model] + ([FALLBACK_MODEL] if FALLBACK_MODEL and FALLBACK_MODEL != model else [])
+
+
+def check(model: str):
+    """
+    Fails fast with CircuitOpenError when every model in the chain is refusing calls.
+    """
+    if all(breaker(m).rejects() for m in models_for(model)):
+        inc("llm_breaker_rejections_total", "Model calls refused by an open circuit breaker", model=model)
+        raise CircuitOpenError(f"Model backend unavailable (circuit open for {model})")
+
+
+def call(attempt: Callable[[str, float], str], model: str, timeout: float,
+         can_retry: Callable[[], bool] = lambda: True) -> str:
+    """
+    Runs attempt(model_name, remaining_seconds) with retries and failover, all within timeout.
+    can_retry lets streaming callers stop retrying once output has reached the client.
+    """
+    deadline = time.monotonic() + timeout
+    last_error: Optional[BaseException] = None
+    for index, name in enumerate(models_for(model)):
+        cb = breaker(name)
+        if index > 0:
+            inc("llm_failover_total", "Calls routed to the fallback model", model=name)
+        for retry in range(LLM_RETRIES + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise last_error or TimeoutError(f"Model call exceeded {timeout}s")
+            if not cb.allow():
+                last_error = last_error or CircuitOpenError(f"Circuit open for {name}")
+                break
+            try:
+                result = attempt(name, remaining)
+            except Exception as e:
+                last_error = e
+                if not is_transient(e):
+                    # The backend answered, so it is healthy; the request itself is the problem
+                    cb.record_success()
+                    break
+                cb.record_failure()
+                if not can_retry():
+                    raise
+                if retry < LLM_RETRIES:
+                    inc("llm_retries_total", "Model call retries after transient errors", model=name)
+                    backoff = random.uniform(0, LLM_RETRY_BASE_SECONDS * (2 ** retry))
+                    time.sleep(min(backoff, max(deadline - time.monotonic(), 0)))
+                continue
+            cb.record_success()
+            return result
+        if not can_retry():
+            break
+    raise last_error or CircuitOpenError(f"Model backend unavailable for {model}")
+
+
+def open_breakers() -> int:
+    with _breakers_lock:
+        return sum(1 for cb in _breakers.values() if cb.state != CircuitBreaker.CLOSED)
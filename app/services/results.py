@@ -0,0 +1,224 @@
+# app/services/results.py
+"""
+Reading and writing model results for an Upload: its interview questions, the
+suitability analysis, the interview evaluation and per-answer scores. List
+fields are stored one row per entry in `evaluation_items`, so they can be
+aggregated in SQL (see app/services/dashboard.py). Saving a result also folds
+the change into its per-JD rollup (see app/services/analytics.py).
+Routes and background jobs go through these helpers instead of touching the tables directly.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import AnswerEvaluation, EvaluationItem, InterviewEvaluation, InterviewQuestion, Upload
+from app.services import analytics
+
+# result field -> EvaluationItem.kind
+SUITABILITY_ITEMS = {"strengths": "strength", "weaknesses": "weakness", "recommendations": "recommendation"}
+INTERVIEW_ITEMS = {"positives": "positive", "improvements": "improvement", "preparation_needed": "preparation"}
+
+
+def normalize_item(text: str) -> str:
+    return " ".join(text.lower().split())[:255]
+
+
+def load_questions(db: Session, upload_id: int) -> list:
+    rows = (
+        db.query(InterviewQuestion.text)
+        .filter(InterviewQuestion.upload_id == upload_id)
+        .order_by(InterviewQuestion.position)
+        .all()
+    )
+    return [text for (text,) in rows]
+
+
+def save_questions(db: Session, upload_id: int, questions: list):
+    db.query(InterviewQuestion).filter(InterviewQuestion.upload_id == upload_id).delete()
+    db.add_all(
+        InterviewQuestion(upload_id=upload_id, position=i, text=str(q)) for i, q in enumerate(questions)
+    )
+    db.commit()
+
+
+def _load_items(db: Session, upload_ids: Iterable[int], fields: Dict[str, str]) -> Dict[int, Dict[str, list]]:
+    """
+    {upload_id: {field: [text, ...]}} for the given result fields, in one query.
+    """
+    kinds = {kind: field for field, kind in fields.items()}
+    out = {upload_id: {field: [] for field in fields} for upload_id in upload_ids}
+    if not out:
+        return out
+    rows = (
+        db.query(EvaluationItem.upload_id, EvaluationItem.kind, EvaluationItem.text)
+        .filter(EvaluationItem.upload_id.in_(list(out)), EvaluationItem.kind.in_(list(kinds)))
+        .order_by(EvaluationItem.upload_id, EvaluationItem.kind, EvaluationItem.position)
+        .all()
+    )
+    for upload_id, kind, text in rows:
+        out[upload_id][kinds[kind]].append(text)
+    return out
+
+
+def _replace_items(db: Session, upload_id: int, fields: Dict[str, str], result: dict):
+    """
+    Replaces the upload's items for the given fields; returns the (kind, normalized, text)
+    items removed and added, for the JD rollups.
+    """
+    existing = EvaluationItem.upload_id == upload_id, EvaluationItem.kind.in_(list(fields.values()))
+    removed = db.query(EvaluationItem.kind, EvaluationItem.normalized, EvaluationItem.text).filter(*existing).all()
+    db.query(EvaluationItem).filter(*existing).delete(synchronize_session=False)
+    added = []
+    for field, kind in fields.items():
+        for position, value in enumerate(result.get(field) or []):
+            text = str(value)
+            item = EvaluationItem(
+                upload_id=upload_id, kind=kind, position=position, text=text, normalized=normalize_item(text)
+            )
+            db.add(item)
+            added.append((kind, item.normalized, text))
+    return removed, added
+
+
+def load_suitabilities(db: Session, uploads: List[Upload]) -> Dict[int, Optional[dict]]:
+    """
+    {upload_id: analysis or None} for many uploads at once (see load_suitability).
+    """
+    analyzed = [u for u in uploads if u.analyzed_at is not None]
+    items = _load_items(db, [u.id for u in analyzed], SUITABILITY_ITEMS)
+    out = {u.id: None for u in uploads}
+    for u in analyzed:
+        out[u.id] = {"score": u.analysis_score, "summary": u.analysis_summary, **items[u.id]}
+    return out
+
+
+def load_suitability(db: Session, upload: Upload) -> Optional[dict]:
+    """
+    Returns the stored suitability analysis, or None if it has not run yet.
+    """
+    return load_suitabilities(db, [upload])[upload.id]
+
+
+def save_suitability(db: Session, upload: Upload, result: dict):
+    """
+    Stores the analysis and folds it into the JD rollups. Fallback (keyword) results are
+    not stored, so the analysis stays retryable and never skews the analytics.
+    """
+    if result.get("fallback"):
+        return
+    old_score = upload.analysis_score if upload.analyzed_at is not None else None
+    upload.analysis_score = result.get("score")
+    upload.analysis_summary = result.get("summary")
+    upload.analyzed_at = datetime.utcnow()
+    removed, added = _replace_items(db, upload.id, SUITABILITY_ITEMS, result)
+    analytics.record_result(db, upload, "suitability", old_score, upload.analysis_score, removed, added)
+    db.add(upload)
+    db.commit()
+
+
+def load_interview_evaluation(db: Session, upload_id: int) -> Optional[dict]:
+    row = db.get(InterviewEvaluation, upload_id)
+    if row is None:
+        return None
+    return {
+        "score": row.score,
+        "summary": row.summary,
+        "detailed_evaluation": row.detailed_evaluation,
+        "feedback": row.feedback,
+        **_load_items(db, [upload_id], INTERVIEW_ITEMS)[upload_id],
+    }
+
+
+def save_interview_evaluation(db: Session, upload: Upload, result: dict):
+    """
+    Stores the evaluation and folds it into the JD rollups. Fallback and failed evaluations
+    are not stored, so the interview stays retryable and never skews the analytics.
+    """
+    if result.get("fallback"):
+        return
+    previous = db.get(InterviewEvaluation, upload.id)
+    old_score = previous.score if previous is not None else None
+    db.merge(InterviewEvaluation(
+        upload_id=upload.id,
+        score=result.get("score"),
+        summary=result.get("summary"),
+        detailed_evaluation=result.get("detailed_evaluation"),
+        feedback=result.get("feedback"),
+        evaluated_at=datetime.utcnow(),
+    ))
+    removed, added = _replace_items(db, upload.id, INTERVIEW_ITEMS, result)
+    analytics.record_result(db, upload, "interview", old_score, result.get("score"), removed, added)
+    db.commit()
+
+
+def load_answer_evaluations(db: Session, upload_id: int) -> dict:
+    """
+    {question_index: AnswerEvaluation} for an upload.
+    """
+    rows = db.query(AnswerEvaluation).filter(AnswerEvaluation.upload_id == upload_id).all()
+    return {row.question_index: row for row in rows}
+
+
+def _answer_row(db: Session, upload_id: int, index: int) -> Optional[AnswerEvaluation]:
+    return (
+        db.query(AnswerEvaluation)
+        .filter(AnswerEvaluation.upload_id == upload_id, AnswerEvaluation.question_index == index)
+        .first()
+    )
+
+
+def save_answer(db: Session, upload_id: int, index: int, question: str, answer: str) -> AnswerEvaluation:
+    """
+    Records a submitted answer. A changed question or answer clears the previous score.
+    """
+    row = _answer_row(db, upload_id, index)
+    if row is None:
+        row = AnswerEvaluation(upload_id=upload_id, question_index=index, question=question, answer=answer)
+    elif row.question != question or row.answer != answer:
+        row.question, row.answer = question, answer
+        row.score = row.feedback = row.evaluated_at = None
+    db.add(row)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Recorded concurrently (the answer endpoint and the final submit)
+        db.rollback()
+        return save_answer(db, upload_id, index, question, answer)
+    return row
+
+
+def save_answer_evaluation(db: Session, upload_id: int, index: int, question: str, answer: str, result: dict):
+    """
+    Stores the score for an answer, unless the answer has been replaced since it was scored
+    or the score is a fallback grade.
+    """
+    if result.get("fallback"):
+        return
+    row = _answer_row(db, upload_id, index)
+    if row is not None and (row.question != question or row.answer != answer):
+        return
+    if row is None:
+        row = save_answer(db, upload_id, index, question, answer)
+    row.score = result.get("score")
+    row.feedback = result.get("feedback")
+    row.evaluated_at = datetime.utcnow()
+    db.add(row)
+    db.commit()
+
+
+def stored_answer_scores(db: Session, upload_id: int) -> dict:
+    """
+    Plain-dict view of load_answer_evaluations, for evaluator.score_answers.
+    """
+    return {
+        index: {"question": row.question, "answer": row.answer, "score": row.score, "feedback": row.feedback}
+        for index, row in load_answer_evaluations(db, upload_id).items()
+    }
+
+
+def save_answer_scores(db: Session, upload_id: int, graded: list):
+    for g in graded:
+        if g["save"]:
+            save_answer_evaluation(db, upload_id, g["index"], g["q"], g["a"], g)
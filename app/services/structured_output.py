@@ -0,0 +1,291 @@
+# app/services/structured_output.py
+"""
+One place for turning model text into validated, typed results.
+
+Responses are requested in JSON mode, parsed (after a single linear-time
+repair pass if strict parsing fails) and validated against the schemas
+below. If that still fails, the model gets exactly one targeted re-ask
+carrying the validation error. Only validated responses reach the LLM cache;
+the re-ask itself is never cached. Parses and re-asks are counted by schema and
+outcome (structured_output_parse_total / structured_output_reask_total), so
+the failure rate is visible at /metrics.
+"""
+import json
+import re
+from typing import List, Optional, Type, TypeVar
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+from app.services import llm_client
+from app.services.metrics import inc, stage
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class StructuredOutputError(Exception):
+    """
+    The model's response could not be parsed into the schema, even after a re-ask.
+    `raw` holds the last response.
+    """
+
+    def __init__(self, message: str, raw: str = ""):
+        super().__init__(message)
+        self.raw = raw
+
+
+def _round_score(value):
+    if isinstance(value, str):
+        value = value.strip().split("/")[0].rstrip("%")  # "7/10", "72%"
+    return round(float(value)) if value not in (None, "") else None
+
+
+def _string_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(v) if not isinstance(v, dict) else json.dumps(v, ensure_ascii=False) for v in value]
+
+
+class QuestionList(BaseModel):
+    questions: List[str] = Field(min_length=1)
+
+    @field_validator("questions")
+    @classmethod
+    def _clean(cls, value):
+        return [q.strip() for q in value if q and q.strip()]
+
+
+class SuitabilityResult(BaseModel):
+    score: Optional[int] = Field(default=None, ge=0, le=100)
+    summary: str = ""
+    strengths: List[str] = []
+    weaknesses: List[str] = []
+    recommendations: List[str] = []
+
+    _score = field_validator("score", mode="before")(_round_score)
+    _lists = field_validator("strengths", "weaknesses", "recommendations", mode="before")(_string_list)
+
+
+class AnswerResult(BaseModel):
+    score: int = Field(ge=0, le=10)
+    feedback: str = ""
+
+    _score = field_validator("score", mode="before")(_round_score)
+
+
+class EvaluationResult(BaseModel):
+    summary: str = ""
+    positives: List[str] = []
+    improvements: List[str] = []
+    preparation_needed: List[str] = []
+    detailed_evaluation: str = ""
+    score: int = Field(ge=0, le=10)
+    feedback: str = ""
+
+    _score = field_validator("score", mode="before")(_round_score)
+    _lists = field_validator("positives", "improvements", "preparation_needed", mode="before")(_string_list)
+
+
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+# opening quote -> the characters that close it; curly quotes inside a '"' string are content
+_OPEN_QUOTES = {'"': '"', "“": '”“"', "”": '”“"', "'": "'"}
+
+
+def _drop_trailing(out: list):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def repair_json(text: str) -> str:
+    """
+    Best-effort fix-up of almost-JSON in one left-to-right pass: skips prose and code
+    fences around the value, converts smart/single quotes and Python literals, escapes raw
+    control characters inside strings, drops trailing commas, ignores anything after the
+    top-level value and closes whatever a truncated response left open.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return text
+    out: list = []
+    stack: list = []
+    quote = None
+    i, n = min(starts), len(text)
+    while i < n:
+        c = text[i]
+        if quote is not None:
+            if c == "\\" and i + 1 < n:
+                nxt = text[i + 1]
+                out.append("'" if nxt == "'" else c + nxt)
+                i += 2
+                continue
+            if c in quote:
+                out.append('"')
+                quote = None
+            elif c == '"':
+                out.append('\\"')  # only reachable inside a single-quoted string
+            elif c == "\n":
+                out.append("\\n")
+            elif c == "\t":
+                out.append("\\t")
+            elif c != "\r":
+                out.append(c)
+            i += 1
+            continue
+
+        if c in _OPEN_QUOTES:
+            quote = _OPEN_QUOTES[c]
+            out.append('"')
+        elif c in _CLOSERS:
+            stack.append(_CLOSERS[c])
+            out.append(c)
+        elif c in "}]":
+            _drop_trailing(out)
+            if stack:
+                out.append(stack.pop())
+            if not stack:
+                break
+        elif c.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(c)
+        i += 1
+
+    if quote is not None:
+        out.append('"')
+    if stack:
+        _drop_trailing(out)
+        if out and out[-1] == ":":
+            out.append("null")
+        while stack:
+            out.append(stack.pop())
+    return "".join(out)
+
+
+def _schema_name(schema: Type[BaseModel]) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", schema.__name__).lower()
+
+
+def _count_parse(schema_name: str, outcome: str):
+    inc("structured_output_parse_total", "Model responses parsed, by schema and outcome (ok|repaired|invalid)",
+        schema=schema_name, outcome=outcome)
+
+
+def _count_reask(schema_name: str, outcome: str):
+    inc("structured_output_reask_total", "Re-asks after an invalid response, by schema and outcome (recovered|failed)",
+        schema=schema_name, outcome=outcome)
+
+
+def parse(text: str, schema: Type[T]) -> T:
+    """
+    Parses and validates text against schema. Raises StructuredOutputError.
+    """
+    name = _schema_name(schema)
+    with stage("json_parse"):
+        try:
+            value = schema.model_validate_json(text)
+            outcome = "ok"
+        except ValidationError:
+            try:
+                value = schema.model_validate_json(repair_json(text or ""))
+                outcome = "repaired"
+            except ValidationError as e:
+                _count_parse(name, "invalid")
+                raise StructuredOutputError(_short_error(e), raw=text) from None
+    _count_parse(name, outcome)
+    return value
+
+
+def _short_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc']) or 'response'}: {err['msg']}" for err in e.errors()[:5]
+    )
+
+
+def _reask_prompt(schema: Type[BaseModel], raw: str, error: str) -> str:
+    return f"""
+    Your previous response could not be used: {error}
+
+    Previous response:
+    {raw[:4000]}
+
+    Return ONLY the corrected JSON object (no markdown, no commentary) matching this JSON schema:
+    {json.dumps(schema.model_json_schema())}
+    """
+
+
+async def reask(schema: Type[T], raw: str, error: str) -> T:
+    """
+    The single targeted retry: shows the model its own output and what was wrong with it.
+    """
+    name = _schema_name(schema)
+    retry_raw = await llm_client.generate(_reask_prompt(schema, raw, error), json_mode=True, use_cache=False)
+    try:
+        value = parse(retry_raw, schema)
+    except StructuredOutputError as e:
+        _count_reask(name, "failed")
+        raise StructuredOutputError(str(e), raw=retry_raw) from None
+    _count_reask(name, "recovered")
+    return value
+
+
+async def parse_or_reask(raw: str, schema: Type[T], prompt: Optional[str] = None) -> T:
+    """
+    Parses raw (re-asking once if needed). With the prompt that produced raw, the validated
+    result is cached for that prompt.
+    """
+    try:
+        value = parse(raw, schema)
+    except StructuredOutputError as e:
+        value = await reask(schema, raw, str(e))
+        raw = value.model_dump_json()
+    if prompt is not None:
+        llm_client.remember(prompt, raw, json_mode=True)
+    return value
+
+
+async def generate(prompt: str, schema: Type[T]) -> T:
+    """
+    Model call in JSON mode, validated against schema, with at most one re-ask.
+    Raises StructuredOutputError (or the model call's own error).
+    """
+    raw = await llm_client.generate(prompt, json_mode=True)
+    return await parse_or_reask(raw, schema, prompt)
+
+
+def clean_question_line(line: str) -> str:
+    """
+    Strips list numbering/bullets from one line of model output ("" for blank lines).
+    """
+    return re.sub(r'^[\-\*\d\.\)\s]+', '', line).strip()
+
+
+def parse_questions(text: str, n: int) -> List[str]:
+    """
+    Questions arrive one per line (so they can stream); a JSON list or {"questions": [...]}
+    is accepted too. Returns at most n cleaned questions, [] if none survive.
+    """
+    stripped = (text or "").strip()
+    if stripped[:1] in "[{":
+        repaired = repair_json(stripped)
+        try:
+            data = json.loads(repaired)
+            if isinstance(data, list):
+                data = {"questions": data}
+            return QuestionList.model_validate(data).questions[:n]
+        except (ValueError, ValidationError):
+            pass
+    lines = [clean_question_line(line) for line in stripped.splitlines()]
+    try:
+        return QuestionList(questions=lines).questions[:n]
+    except ValidationError:
+        return []
@@ -1,30 +1,58 @@
 # app/services/suitability_agent.py
-import os, re, json
-import google.generativeai as genai
+import logging
+from collections import Counter
 
-from dotenv import load_dotenv
+from app.services import structured_output
+from app.services.structured_output import SuitabilityResult
+from app.services.context_selector import CONTEXT_TOKEN_BUDGET, select_context, tokenize
+from app.services.metrics import stage
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-MODEL = "gemini-2.5-flash-lite"
-
-def analyze_candidate(resume_text: str, jd_text: str):
-    prompt = f"""
+def build_suitability_prompt(resume_text: str, jd_text: str) -> str:
+    # Scoring fit needs a wider view than question generation (was 2000 vs 1500 chars)
+    resume_text, jd_text = select_context(resume_text, jd_text, CONTEXT_TOKEN_BUDGET * 4 // 3)
+    return f"""
     You are a senior technical hiring evaluator. Given the resume and job description, return ONLY valid JSON with fields:
     {{"score": <0-100 integer>, "summary": "<1-2 sentence summary>", "strengths": ["..."], "weaknesses": ["..."], "recommendations": ["..."]}}
 
     Resume:
-    {resume_text[:2000]}
+    {resume_text}
 
     Job Description:
-    {jd_text[:2000]}
+    {jd_text}
+    """
+
+def fallback_suitability(resume_text: str, jd_text: str, top_terms: int = 25) -> dict:
     """
-    model = genai.GenerativeModel(MODEL)
-    resp = model.generate_content(prompt)
-    raw = resp if isinstance(resp, str) else getattr(resp, "text", str(resp))
-    raw = re.sub(r"^```(?:json)?\s*|\s*```$", "", raw, flags=re.MULTILINE).strip()
+    Keyword-coverage estimate used when the model is unavailable: the share of the JD's
+    most frequent terms that also appear in the resume. Flagged so it is shown but never
+    stored in place of a real analysis.
+    """
+    jd_terms = [t for t, _ in Counter(tokenize(jd_text)).most_common(top_terms)]
+    resume_terms = set(tokenize(resume_text))
+    matched = [t for t in jd_terms if t in resume_terms]
+    missing = [t for t in jd_terms if t not in resume_terms]
+    score = round(100 * len(matched) / len(jd_terms)) if jd_terms else None
+    return {
+        "score": score,
+        "summary": (
+            "Basic analysis: keyword match between resume and job description (AI unavailable). "
+            f"{len(matched)} of the job description's {len(jd_terms)} key terms appear in the resume."
+        ),
+        "strengths": [f"Mentions {t}" for t in matched[:5]],
+        "weaknesses": [f"No mention of {t}" for t in missing[:5]],
+        "recommendations": [f"Highlight any experience with {t}" for t in missing[:3]],
+        "fallback": True,
+    }
+
+
+async def analyze_candidate(resume_text: str, jd_text: str):
+    with stage("prompt_build"):
+        prompt = build_suitability_prompt(resume_text, jd_text)
     try:
-        return json.loads(raw)
-    except Exception:
-        return {"score": None, "summary": raw, "strengths": [], "weaknesses": [], "recommendations": []}
+        return (await structured_output.generate(prompt, SuitabilityResult)).model_dump()
+    except Exception as e:
+        # Includes StructuredOutputError: unparseable model text is not an analysis either
+        logger.warning("Suitability analysis failed, using keyword fallback: %s", e)
+        return fallback_suitability(resume_text, jd_text)
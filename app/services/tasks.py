@@ -0,0 +1,155 @@
+# app/services/tasks.py
+"""
+Job handlers for the background queue (see app/services/jobs.py).
+"""
+import asyncio
+
+from app.db import SessionLocal, Upload
+from app.services.jobs import handler, save_progress
+from app.services.text_extraction import get_upload_texts
+from app.services.question_bank import build_question_set
+from app.services.evaluator import evaluate_answer, score_answers, summarize_interview
+from app.services.suitability_agent import analyze_candidate
+from app.services import results
+
+# ✅ Default fallback if AI fails
+DEFAULT_QUESTIONS = [
+    "Tell me about yourself.",
+    "Describe a project you worked on.",
+    "What is your greatest strength?",
+    "What is your greatest weakness?",
+    "Why do you want this job?"
+]
+
+
+def _get_upload(db, upload_id: int) -> Upload:
+    upload = db.query(Upload).filter(Upload.id == upload_id).first()
+    if not upload:
+        raise LookupError(f"Upload {upload_id} not found")
+    return upload
+
+
+@handler("suitability")
+async def run_suitability(upload_id: int, payload: dict):
+    db = SessionLocal()
+    try:
+        upload = _get_upload(db, upload_id)
+        resume_text, jd_text = get_upload_texts(upload)
+        result = await analyze_candidate(resume_text, jd_text)
+        results.save_suitability(db, upload, result)
+        # A fallback result is not stored; the job result still carries it for display
+        return results.load_suitability(db, upload) or result
+    finally:
+        db.close()
+
+
+@handler("questions")
+async def run_questions(upload_id: int, payload: dict):
+    db = SessionLocal()
+    try:
+        upload = _get_upload(db, upload_id)
+        questions = results.load_questions(db, upload_id)
+        if not questions:
+            resume_text, jd_text = get_upload_texts(upload)
+            questions = await build_question_set(resume_text, jd_text, n=payload.get("n", 5))
+            if not questions or not isinstance(questions, list):
+                questions = DEFAULT_QUESTIONS
+            results.save_questions(db, upload_id, questions)
+        return {"questions": questions}
+    finally:
+        db.close()
+
+
+@handler("answer")
+async def run_answer(upload_id: int, payload: dict):
+    """
+    Grades one answer while the candidate works on the next question.
+    """
+    db = SessionLocal()
+    try:
+        upload = _get_upload(db, upload_id)
+        resume_text, jd_text = get_upload_texts(upload)
+        index, question, answer = payload["index"], payload.get("q", ""), payload.get("a", "")
+        result = await evaluate_answer(resume_text, jd_text, question, answer)
+        if not result.get("fallback"):
+            # A heuristic grade is not stored, so the final submit tries the model again
+            results.save_answer_evaluation(db, upload_id, index, question, answer, result)
+        return result
+    finally:
+        db.close()
+
+
+@handler("evaluation")
+async def run_evaluation(upload_id: int, payload: dict):
+    db = SessionLocal()
+    try:
+        upload = _get_upload(db, upload_id)
+        resume_text, jd_text = get_upload_texts(upload)
+        qa_list = payload.get("qa_list", [])
+        try:
+            graded = await score_answers(resume_text, jd_text, qa_list, results.stored_answer_scores(db, upload_id))
+            results.save_answer_scores(db, upload_id, graded)
+            result = await summarize_interview(resume_text, jd_text, graded)
+            result["answers"] = [{"q": g["q"], "score": g["score"], "feedback": g["feedback"]} for g in graded]
+        except Exception as e:
+            result = {"score": 5, "feedback": f"Evaluation failed: {e}", "fallback": True}
+        # A fallback or failed evaluation is not stored, so a later submit grades it again
+        results.save_interview_evaluation(db, upload, result)
+        return result
+    finally:
+        db.close()
+
+
+def _save(upload_id: int, save, value):
+    """
+    Persists one pipeline result on its own session, so concurrent steps never share one.
+    """
+    db = SessionLocal()
+    try:
+        save(db, _get_upload(db, upload_id), value)
+    finally:
+        db.close()
+
+
+def _save_questions_once(db, upload: Upload, questions: list):
+    if not results.load_questions(db, upload.id):
+        results.save_questions(db, upload.id, questions)
+
+
+@handler("prepare")
+async def run_prepare(upload_id: int, payload: dict):
+    """
+    Upload pipeline: extracts both documents once, then runs suitability analysis and
+    question generation concurrently. Each result is saved (and published as job progress)
+    as soon as it is ready; on a retry, steps that already finished are skipped.
+    """
+    db = SessionLocal()
+    try:
+        upload = _get_upload(db, upload_id)
+        resume_text, jd_text = get_upload_texts(upload)
+        progress = {
+            "suitability": results.load_suitability(db, upload),
+            "questions": results.load_questions(db, upload_id) or None,
+        }
+    finally:
+        db.close()
+
+    async def suitability():
+        result = await analyze_candidate(resume_text, jd_text)
+        _save(upload_id, results.save_suitability, result)
+        progress["suitability"] = result
+        save_progress(progress)
+
+    async def questions():
+        qs = await build_question_set(resume_text, jd_text, n=payload.get("n", 5))
+        _save(upload_id, _save_questions_once, qs or DEFAULT_QUESTIONS)
+        progress["questions"] = qs or DEFAULT_QUESTIONS
+        save_progress(progress)
+
+    steps = []
+    if progress["suitability"] is None:
+        steps.append(suitability())
+    if progress["questions"] is None:
+        steps.append(questions())
+    await asyncio.gather(*steps)
+    return progress
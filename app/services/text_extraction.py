@@ -0,0 +1,194 @@
+# app/services/text_extraction.py
+"""
+Single entry point for turning an uploaded document into text.
+
+Extraction (app/services/extractors.py) results are content-addressed by the
+SHA-256 of the file bytes: a bounded in-process LRU sits in front of the
+`extracted_texts` table, so a document is parsed at most once no matter how
+many routes (or candidates sharing the same JD) ask for it.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.db import SessionLocal, ExtractedText
+from app.services.extractors import EXTRACTOR_VERSION, ExtractedDocument, extract_document
+from app.services.metrics import stage
+
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+class _ByteBoundedLRU:
+    """LRU mapping sha256 -> ExtractedDocument, evicting once the stored text exceeds max_bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, Tuple[ExtractedDocument, int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[ExtractedDocument]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key: str, doc: ExtractedDocument) -> None:
+        cost = len(doc.text.encode("utf-8"))
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._items[key] = (doc, cost)
+            self._size += cost
+            while self._size > self.max_bytes and self._items:
+                _, (_, evicted_cost) = self._items.popitem(last=False)
+                self._size -= evicted_cost
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+_cache = _ByteBoundedLRU(TEXT_CACHE_MAX_BYTES)
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _load_persisted(sha256: str) -> Optional[ExtractedDocument]:
+    db = SessionLocal()
+    try:
+        row = db.get(ExtractedText, sha256)
+        if row is None or row.extractor_version != EXTRACTOR_VERSION:
+            return None
+        return ExtractedDocument(
+            text=row.text,
+            page_count=row.page_count,
+            page_offsets=json.loads(row.page_offsets or "[]"),
+            sections=json.loads(row.sections or "[]"),
+            format=row.format or "unknown",
+        )
+    finally:
+        db.close()
+
+
+def _persist(sha256: str, doc: ExtractedDocument, extraction_ms: int) -> None:
+    db = SessionLocal()
+    try:
+        # merge: replaces rows written by an older extractor version
+        db.merge(ExtractedText(
+            sha256=sha256,
+            text=doc.text,
+            page_count=doc.page_count,
+            extraction_ms=extraction_ms,
+            format=doc.format,
+            page_offsets=json.dumps(doc.page_offsets),
+            sections=json.dumps(doc.sections),
+            extractor_version=EXTRACTOR_VERSION,
+        ))
+        db.commit()
+    except Exception:
+        # Another request extracted the same document concurrently
+        db.rollback()
+    finally:
+        db.close()
+
+
+def get_document_by_hash(sha256: str) -> Optional[ExtractedDocument]:
+    """
+    Returns the cached extraction for a document hash without touching the file, or None.
+    """
+    doc = _cache.get(sha256)
+    if doc is None:
+        doc = _load_persisted(sha256)
+        if doc is not None:
+            _cache.put(sha256, doc)
+    return doc
+
+
+def get_document_for_bytes(data: bytes) -> Optional[ExtractedDocument]:
+    """
+    Extracts raw document bytes, parsing only on a cache miss.
+    Unparseable documents yield None and are not persisted, so a fixed parser can retry them;
+    text cut short by the extraction deadline is returned but not cached either.
+    """
+    sha256 = sha256_bytes(data)
+    doc = get_document_by_hash(sha256)
+    if doc is not None:
+        return doc
+
+    started = time.perf_counter()
+    try:
+        with stage("pdf_extract"):
+            doc = extract_document(data)
+    except Exception:
+        return None
+    extraction_ms = int((time.perf_counter() - started) * 1000)
+    if not doc.complete:
+        return doc
+
+    _cache.put(sha256, doc)
+    _persist(sha256, doc, extraction_ms)
+    return doc
+
+
+def get_stored_document(sha256: Optional[str], path: Optional[str]) -> Optional[ExtractedDocument]:
+    """
+    Extraction for a stored upload: by content hash when known, else from the file.
+    """
+    if sha256:
+        doc = get_document_by_hash(sha256)
+        if doc is not None:
+            return doc
+    if not path:
+        return None
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    return get_document_for_bytes(data)
+
+
+def get_text_by_hash(sha256: str) -> Optional[str]:
+    doc = get_document_by_hash(sha256)
+    return doc.text if doc else None
+
+
+def get_text_for_bytes(data: bytes) -> str:
+    doc = get_document_for_bytes(data)
+    return doc.text if doc else ""
+
+
+def get_document_text(path: Optional[str]) -> str:
+    """
+    Fail-soft: returns "" when path is missing or unreadable.
+    """
+    doc = get_stored_document(None, path)
+    return doc.text if doc else ""
+
+
+def get_stored_text(sha256: Optional[str], path: Optional[str]) -> str:
+    doc = get_stored_document(sha256, path)
+    return doc.text if doc else ""
+
+
+def get_upload_texts(upload) -> Tuple[str, str]:
+    """
+    (resume_text, jd_text) for an Upload row.
+    """
+    return (
+        get_stored_text(upload.resume_sha256, upload.resume_path),
+        get_stored_text(upload.jd_sha256, upload.jd_path),
+    )
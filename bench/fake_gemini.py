@@ -0,0 +1,127 @@
+# bench/fake_gemini.py
+"""
+Local stand-in for `google.generativeai` used by the benchmark harness.
+
+`install()` registers this module as google.generativeai before the app is
+imported, so every model call made through app/services/llm_client.py lands
+here instead of the network. Behaviour is tuned with:
+
+    latency_ms       mean response latency (uniform +/- jitter_ms)
+    error_rate       fraction of calls raising a transient error
+    malformed_rate   fraction of JSON responses returned truncated/broken
+"""
+import json
+import random
+import sys
+import threading
+import time
+import types
+
+settings = {
+    "latency_ms": 800.0,
+    "jitter_ms": 200.0,
+    "error_rate": 0.0,
+    "malformed_rate": 0.0,
+}
+stats = {"calls": 0, "errors": 0, "malformed": 0}
+_lock = threading.Lock()
+
+
+class ServiceUnavailable(Exception):
+    """Same name as google.api_core.exceptions.ServiceUnavailable, which is_transient matches on."""
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def _questions() -> str:
+    return "\n".join(
+        f"{i}. Fake question {i}: describe how you would apply your experience here."
+        for i in range(1, 6)
+    )
+
+
+def _suitability() -> str:
+    return json.dumps({
+        "score": random.randint(30, 95),
+        "summary": "Fake suitability summary.",
+        "strengths": ["Python", "APIs", "Testing"],
+        "weaknesses": ["Kubernetes"],
+        "recommendations": ["Practice system design"],
+    })
+
+
+def _evaluation() -> str:
+    return json.dumps({
+        "summary": "Fake interview summary.",
+        "positives": ["Clear communication", "Relevant examples", "Structured answers"],
+        "improvements": ["Depth on trade-offs", "Quantify impact", "Testing strategy"],
+        "preparation_needed": [f"Topic {i}" for i in range(8)],
+        "detailed_evaluation": "Fake detailed evaluation.",
+        "score": random.randint(3, 9),
+        "feedback": "Fake overall feedback.",
+    })
+
+
+def _respond(prompt: str) -> str:
+    with _lock:
+        stats["calls"] += 1
+        fail = random.random() < settings["error_rate"]
+        if fail:
+            stats["errors"] += 1
+    delay = settings["latency_ms"] + random.uniform(-settings["jitter_ms"], settings["jitter_ms"])
+    time.sleep(max(delay, 0) / 1000)
+    if fail:
+        raise ServiceUnavailable("503 fake model backend unavailable")
+
+    if '"positives"' in prompt:
+        text = _evaluation()
+    elif '"strengths"' in prompt:
+        text = _suitability()
+    elif "interview questions" in prompt:
+        return _questions()
+    else:
+        text = json.dumps({"score": random.randint(3, 9), "feedback": "Fake feedback."})
+
+    if random.random() < settings["malformed_rate"]:
+        with _lock:
+            stats["malformed"] += 1
+        text = "Here is the JSON:\n```json\n" + text[: len(text) // 2]
+    return text
+
+
+def configure(**kwargs):
+    pass
+
+
+class GenerativeModel:
+    def __init__(self, model_name: str, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        text = _respond(str(contents))
+        if stream:
+            return iter([_Response(text[i:i + 40]) for i in range(0, len(text), 40)])
+        return _Response(text)
+
+    async def generate_content_async(self, contents, **kwargs):
+        import asyncio
+        return await asyncio.to_thread(self.generate_content, contents, **kwargs)
+
+
+def install(**overrides):
+    """
+    Registers this module as google.generativeai and applies setting overrides.
+    """
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    module = sys.modules[__name__]
+    google = sys.modules.get("google")
+    if google is None:
+        google = types.ModuleType("google")
+        google.__path__ = []
+        sys.modules["google"] = google
+    google.generativeai = module
+    sys.modules["google.generativeai"] = module
+    return module
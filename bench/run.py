@@ -0,0 +1,339 @@
+# bench/run.py
+"""
+End-to-end load test for the candidate flow against a local Gemini stand-in.
+
+Boots app.main:App under uvicorn (in this process, with its own temp DB and
+blob store), replaces google.generativeai with bench/fake_gemini.py and drives
+N sessions of
+
+    register -> login -> /files/upload -> /suitability/view (until analysed)
+    -> /interview/start -> /interview/stream/questions -> /interview/answer (per answer)
+    -> /interview/submit (until evaluated)
+
+at a fixed concurrency, while a prober hits /ping to show whether non-LLM
+routes stay flat. Reports throughput, p50/p95/p99 per route and DB write /
+lock-wait timings, and writes the results as JSON for later comparison.
+
+    python -m bench.run --sessions 40 --concurrency 10 --latency-ms 800
+    python -m bench.run --sessions 40 --concurrency 10 --compare bench/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+RESUME_PDF = os.path.join(ROOT, "data", "ADITYA_RAJ.pdf")
+JD_PDF = os.path.join(ROOT, "data", "jd2.pdf")
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(samples) -> dict:
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50), 2),
+        "p95_ms": round(percentile(samples, 95), 2),
+        "p99_ms": round(percentile(samples, 99), 2),
+        "max_ms": round(max(samples), 2) if samples else 0.0,
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, route: str, started: float, ok: bool = True):
+        self.latencies[route].append((time.perf_counter() - started) * 1000)
+        if not ok:
+            self.errors[route] += 1
+
+
+class DBTimings:
+    """
+    Times write statements on both engines and counts 'database is locked' errors.
+    Long write times under concurrency are lock waits (busy_timeout spinning).
+    """
+
+    def __init__(self):
+        self.write_ms = []
+        self.lock_errors = 0
+
+    def attach(self, engine):
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("bench_t0", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info["bench_t0"].pop()
+            if statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+                self.write_ms.append((time.perf_counter() - started) * 1000)
+
+        @event.listens_for(engine, "handle_error")
+        def _error(context):
+            if "locked" in str(context.original_exception).lower():
+                self.lock_errors += 1
+
+    def report(self) -> dict:
+        report = summarize(self.write_ms)
+        report["lock_errors"] = self.lock_errors
+        report["total_write_ms"] = round(sum(self.write_ms), 2)
+        return report
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, workdir: str):
+    """
+    Configures the environment, installs the fake model and serves the app on a background thread.
+    """
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["BLOB_STORE_DIR"] = os.path.join(workdir, "blobs")
+    os.environ["GEMINI_API_KEY"] = "bench-fake-key"
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    os.environ["JOB_WORKERS"] = str(args.job_workers)
+    # Every simulated candidate logs in from 127.0.0.1; 0 turns the per-IP login limit off
+    os.environ.setdefault("AUTH_IP_RATE_PER_MINUTE", "0")
+    if args.no_llm_cache:
+        # Every session uploads the same PDFs; without this most model calls are cache hits
+        os.environ["LLM_CACHE_MAX_ENTRIES"] = "0"
+
+    from bench import fake_gemini
+    fake_gemini.install(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+    )
+
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    import uvicorn
+    from app.db import engine, async_engine
+    from app.main import App
+
+    db_timings = DBTimings()
+    db_timings.attach(engine)
+    db_timings.attach(async_engine.sync_engine)
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(App, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}", db_timings, fake_gemini
+
+
+async def _timed(rec: Recorder, route: str, coro):
+    started = time.perf_counter()
+    try:
+        resp = await coro
+    except Exception:
+        rec.add(route, started, ok=False)
+        raise
+    rec.add(route, started, ok=resp.status_code < 400)
+    return resp
+
+
+async def _wait_job(client, rec: Recorder, job_id, timeout: float = 120.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = (await _timed(rec, "GET /jobs/{id}", client.get(f"/jobs/{job_id}"))).json()
+        if job["status"] in ("done", "failed"):
+            return job
+        await asyncio.sleep(0.25)
+    raise TimeoutError(f"job {job_id} did not finish")
+
+
+async def run_session(base_url: str, rec: Recorder, resume: bytes, jd: bytes, answer_ms: float = 0.0):
+    import httpx
+
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    async with httpx.AsyncClient(base_url=base_url, timeout=180.0) as client:
+        session_started = time.perf_counter()
+        await _timed(rec, "POST /auth/register", client.post(
+            "/auth/register", data={"email": email, "password": "bench-password"}))
+        await _timed(rec, "POST /auth/login", client.post(
+            "/auth/login", data={"email": email, "password": "bench-password"}))
+
+        resp = await _timed(rec, "POST /files/upload", client.post(
+            "/files/upload",
+            data={"user_id": "1"},
+            files={"resume": ("resume.pdf", resume, "application/pdf"), "jd": ("jd.pdf", jd, "application/pdf")},
+        ))
+        upload_id = int(resp.headers["location"].rsplit("/", 1)[1])
+
+        ready_started = time.perf_counter()
+        page = await _timed(rec, "GET /suitability/view/{id}", client.get(f"/suitability/view/{upload_id}"))
+        match = re.search(r"/jobs/(\d+)", page.text)
+        if match:
+            await _wait_job(client, rec, match.group(1))
+            await _timed(rec, "GET /suitability/view/{id}", client.get(f"/suitability/view/{upload_id}"))
+        rec.add("flow: suitability ready", ready_started)
+
+        await _timed(rec, "GET /interview/start/{id}", client.get(f"/interview/start/{upload_id}"))
+
+        started = time.perf_counter()
+        questions = []
+        async with client.stream("GET", f"/interview/stream/questions/{upload_id}") as stream:
+            async for line in stream.aiter_lines():
+                if line.startswith("data: ") and not questions:
+                    rec.add("flow: first question", started)
+                if line.startswith("data: "):
+                    questions.append(json.loads(line[6:]))
+        rec.add("GET /interview/stream/questions/{id}", started)
+
+        qa_list = [{"q": q, "a": "A reasonably detailed benchmark answer."} for q in questions if isinstance(q, str)]
+        for index, qa in enumerate(qa_list):
+            # Each answer is graded in the background while the candidate "types" the next one
+            await asyncio.sleep(answer_ms / 1000)
+            await _timed(rec, "POST /interview/answer", client.post(
+                "/interview/answer", json={"upload_id": upload_id, "index": index, **qa}))
+        eval_started = time.perf_counter()
+        resp = await _timed(rec, "POST /interview/submit", client.post(
+            "/interview/submit", json={"upload_id": upload_id, "qa_list": qa_list or [{"q": "q", "a": "a"}]}))
+        await _wait_job(client, rec, resp.json()["job_id"])
+        rec.add("flow: evaluation ready", eval_started)
+        rec.add("flow: full session", session_started)
+
+
+async def probe_ping(base_url: str, rec: Recorder, stop: asyncio.Event, interval: float):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        while not stop.is_set():
+            await _timed(rec, "GET /ping", client.get("/ping"))
+            await asyncio.sleep(interval)
+
+
+async def drive(args, base_url: str) -> tuple:
+    rec = Recorder()
+    with open(RESUME_PDF, "rb") as f:
+        resume = f.read()
+    with open(JD_PDF, "rb") as f:
+        jd = f.read()
+
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe_ping(base_url, rec, stop, args.ping_interval))
+    sem = asyncio.Semaphore(args.concurrency)
+    failures = []
+
+    async def one():
+        async with sem:
+            try:
+                await run_session(base_url, rec, resume, jd, args.answer_ms)
+            except Exception as e:
+                failures.append(repr(e))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+    return rec, elapsed, failures
+
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nComparison against {baseline_path}")
+    print(f"{'route':45} {'metric':7} {'baseline':>10} {'current':>10} {'delta':>8}")
+    for route, stats in current["routes"].items():
+        base = baseline.get("routes", {}).get(route)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            b, c = base[metric], stats[metric]
+            delta = f"{(c - b) / b * 100:+.1f}%" if b else "n/a"
+            print(f"{route:45} {metric[:3]:7} {b:10.1f} {c:10.1f} {delta:>8}")
+    b, c = baseline["sessions_per_second"], current["sessions_per_second"]
+    print(f"{'throughput (sessions/s)':45} {'':7} {b:10.3f} {c:10.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=800.0)
+    parser.add_argument("--jitter-ms", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--job-workers", type=int, default=4)
+    parser.add_argument("--ping-interval", type=float, default=0.05)
+    parser.add_argument("--answer-ms", type=float, default=0.0, help="simulated time spent on each answer")
+    parser.add_argument("--no-llm-cache", action="store_true", help="disable the LLM response cache")
+    parser.add_argument("--output", help="results file (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="baseline results file to diff against")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="interview-bench-")
+    server, thread, base_url, db_timings, fake = start_server(args, workdir)
+    try:
+        rec, elapsed, failures = asyncio.run(drive(args, base_url))
+    finally:
+        server.should_exit = True
+        thread.join(10)
+
+    requests = sum(len(v) for k, v in rec.latencies.items() if not k.startswith("flow:"))
+    results = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": vars(args),
+        "elapsed_s": round(elapsed, 3),
+        "sessions_per_second": round((args.sessions - len(failures)) / elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 2),
+        "failed_sessions": failures,
+        "routes": {route: dict(summarize(v), errors=rec.errors[route]) for route, v in sorted(rec.latencies.items())},
+        "db_writes": db_timings.report(),
+        "fake_model": dict(fake.stats),
+    }
+
+    print(f"{args.sessions} sessions @ concurrency {args.concurrency} in {elapsed:.1f}s "
+          f"({results['sessions_per_second']} sessions/s, {results['requests_per_second']} req/s), "
+          f"{len(failures)} failed")
+    print(f"{'route':45} {'n':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'err':>4}")
+    for route, stats in results["routes"].items():
+        print(f"{route:45} {stats['count']:5d} {stats['p50_ms']:9.1f} {stats['p95_ms']:9.1f} "
+              f"{stats['p99_ms']:9.1f} {stats['errors']:4d}")
+    db = results["db_writes"]
+    print(f"DB writes: {db['count']} (p99 {db['p99_ms']} ms, max {db['max_ms']} ms, lock errors {db['lock_errors']})")
+    print(f"Fake model: {results['fake_model']}")
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.utcnow().strftime("%Y%m%dT%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
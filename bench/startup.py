@@ -0,0 +1,116 @@
+# bench/startup.py
+"""
+Cold-start benchmark: how long until a fresh process serves /ping.
+
+Each run starts a new interpreter with its own temp DB and blob store, and
+times `import app.main`, then serves the app under uvicorn and polls /ping
+until it answers (lifespan startup, including migrations when
+MIGRATE_ON_STARTUP=1). Reports the median and worst of N runs, and with
+--importtime the modules that take longest to import.
+
+    python -m bench.startup --runs 5
+    python -m bench.startup --runs 5 --no-migrate --importtime 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process; prints one JSON line of timings (seconds from the start of `import app.main`)
+CHILD = r"""
+import json, socket, threading, time, urllib.request
+t0 = time.perf_counter()
+import app.main
+t_import = time.perf_counter()
+import uvicorn
+with socket.socket() as s:
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+server = uvicorn.Server(uvicorn.Config(app.main.App, host="127.0.0.1", port=port, log_level="warning"))
+threading.Thread(target=server.run, daemon=True).start()
+while True:
+    try:
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/ping", timeout=1).read()
+        break
+    except OSError:
+        time.sleep(0.005)
+t_ready = time.perf_counter()
+print(json.dumps({"import_s": t_import - t0, "ready_s": t_ready - t0}))
+server.should_exit = True
+"""
+
+
+def _env(workdir: str, migrate: bool) -> dict:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'startup.db')}"
+    env.pop("ASYNC_DATABASE_URL", None)
+    env["BLOB_STORE_DIR"] = os.path.join(workdir, "blobs")
+    env.setdefault("GEMINI_API_KEY", "bench-fake-key")
+    env.setdefault("SECRET_KEY", "bench-secret")
+    env["MIGRATE_ON_STARTUP"] = "1" if migrate else "0"
+    return env
+
+
+def run_once(migrate: bool) -> dict:
+    workdir = tempfile.mkdtemp(prefix="interview-startup-")
+    env = _env(workdir, migrate)
+    if not migrate:
+        # Pods that skip boot-time migrations expect the schema to be in place already
+        subprocess.run([sys.executable, "-m", "app.migrations"], cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, check=True,
+                         capture_output=True, text=True)
+    timings = json.loads(out.stdout.strip().splitlines()[-1])
+    timings["process_ready_s"] = time.perf_counter() - started
+    return timings
+
+
+def import_profile(top: int) -> list:
+    """
+    [(cumulative_ms, module)] for the slowest top-level imports under `-X importtime`.
+    """
+    env = _env(tempfile.mkdtemp(prefix="interview-startup-"), migrate=False)
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=ROOT, env=env,
+                         check=True, capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # app.main and its direct imports only, so nested modules are not double-counted
+        if len(name) - len(name.lstrip()) <= 3:
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--no-migrate", action="store_true",
+                        help="run migrations beforehand and start with MIGRATE_ON_STARTUP=0")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="also list the N slowest imports")
+    args = parser.parse_args(argv)
+
+    runs = [run_once(migrate=not args.no_migrate) for _ in range(args.runs)]
+    print(f"{args.runs} cold starts (MIGRATE_ON_STARTUP={0 if args.no_migrate else 1})")
+    print(f"{'':28} {'median':>9} {'max':>9}")
+    for key, label in (("import_s", "import app.main"), ("ready_s", "import + lifespan + /ping"),
+                       ("process_ready_s", "process spawn -> /ping")):
+        values = [r[key] * 1000 for r in runs]
+        print(f"{label:28} {statistics.median(values):7.0f}ms {max(values):7.0f}ms")
+
+    if args.importtime:
+        print("\nSlowest imports (cumulative):")
+        for ms, name in import_profile(args.importtime):
+            print(f"{ms:9.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()